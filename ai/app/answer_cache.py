@@ -0,0 +1,153 @@
+"""
+Semantic answer cache for repeated single-turn questions.
+
+An answer is replayed when a new question's embedding is within
+`answer_cache_max_distance` (cosine) of a previously answered one *and*
+retrieval returned exactly the same chunk IDs. Entries are grouped by
+index version and chunk IDs, so a lookup only compares against questions
+that saw the same context, and answers from a replaced index are never
+replayed (they age out of the LRU).
+"""
+
+import math
+import struct
+import time
+from array import array
+from typing import List, Optional, Tuple
+
+from app.cachestore import CacheBackend, create_cache, make_key
+from app.config import settings
+
+# ----------------------------------------------------------------------
+
+# Questions remembered per context; the oldest is dropped first
+MAX_PER_CONTEXT = 8
+
+# Per question: stored_at (wall clock, shared by workers), dimensions,
+# answer length; then the float32 unit vector and the UTF-8 answer
+_ENTRY_HEADER = struct.Struct("<dII")
+
+
+def _normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+def _pack(entries: List[Tuple[float, array, str]]) -> bytes:
+    parts = []
+    for stored_at, vector, answer in entries:
+        encoded = answer.encode("utf-8")
+        parts += [_ENTRY_HEADER.pack(stored_at, len(vector), len(encoded)), vector.tobytes(), encoded]
+    return b"".join(parts)
+
+
+def _unpack(data: bytes) -> List[Tuple[float, array, str]]:
+    entries = []
+    offset = 0
+    while offset < len(data):
+        stored_at, dimensions, length = _ENTRY_HEADER.unpack_from(data, offset)
+        offset += _ENTRY_HEADER.size
+        vector = array("f")
+        vector.frombytes(data[offset:offset + 4 * dimensions])
+        offset += 4 * dimensions
+        entries.append((stored_at, vector, data[offset:offset + length].decode("utf-8")))
+        offset += length
+    return entries
+
+
+class AnswerCache:
+    """Cache of generated answers keyed by question embedding and context."""
+
+    def __init__(
+        self,
+        max_entries: int = None,
+        max_distance: float = None,
+        ttl: float = None,
+        backend: CacheBackend = None,
+    ):
+        self.max_distance = max_distance if max_distance is not None else settings.answer_cache_max_distance
+        self.ttl = ttl if ttl is not None else settings.answer_cache_ttl
+        # One entry per (index version, chunk ids) holding up to MAX_PER_CONTEXT questions
+        self.backend = backend if backend is not None else create_cache(
+            "answer",
+            max_entries=max_entries or settings.answer_cache_max_entries,
+            ttl=self.ttl,
+        )
+        self._index_version = None
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _key(self, chunk_ids: List[str], index_version: Optional[str]) -> bytes:
+        if index_version != self._index_version:
+            if self._index_version is not None:
+                self.invalidations += 1
+            self._index_version = index_version
+        return make_key(index_version, *chunk_ids)
+
+    def _entries(self, key: bytes) -> List[Tuple[float, array, str]]:
+        value = self.backend.get(key)
+        if value is None:
+            return []
+        entries = _unpack(value)
+        if self.ttl:
+            expired_before = time.time() - self.ttl
+            entries = [entry for entry in entries if entry[0] >= expired_before]
+        return entries
+
+    def lookup(
+        self,
+        embedding: List[float],
+        chunk_ids: List[str],
+        index_version: Optional[str] = None,
+    ) -> Optional[str]:
+        """Return a cached answer for a near-identical question, or None."""
+        query = _normalize(embedding)
+
+        best_answer, best_distance = None, None
+        for _, vector, answer in self._entries(self._key(chunk_ids, index_version)):
+            distance = 1 - sum(a * b for a, b in zip(query, vector))
+            if distance <= self.max_distance and (best_distance is None or distance < best_distance):
+                best_answer, best_distance = answer, distance
+
+        if best_answer is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return best_answer
+
+    def store(
+        self,
+        embedding: List[float],
+        chunk_ids: List[str],
+        answer: str,
+        index_version: Optional[str] = None,
+    ) -> None:
+        """Remember the answer generated for a question."""
+        if not answer:
+            return
+
+        key = self._key(chunk_ids, index_version)
+        # Read-modify-write: a concurrent store for the same context in
+        # another worker may be lost, which only costs a future miss
+        entries = self._entries(key)
+        entries.append((time.time(), array("f", _normalize(embedding)), answer))
+        self.backend.set(key, _pack(entries[-MAX_PER_CONTEXT:]))
+
+    def clear(self) -> None:
+        """Drop all cached answers."""
+        self.backend.clear()
+
+    def get_stats(self) -> dict:
+        """Get cache statistics."""
+        stats = self.backend.get_stats()
+        return {
+            "backend": stats["backend"],
+            "entries": stats["entries"],
+            "bytes": stats["bytes"],
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
@@ -27,4 +27,28 @@ async def verify_token(request: Request) -> dict:
         )
         return payload
     except JWTError as e:
-        raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
+
+
+def get_user_key(request: Request) -> str:
+    """
+    Identify the caller for per-user fairness.
+
+    Uses the JWT subject when a valid token is sent, otherwise the
+    client address. Never rejects the request.
+    """
+    auth_header = request.headers.get("Authorization")
+
+    if auth_header and auth_header.startswith("Bearer ") and settings.jwt_secret:
+        try:
+            payload = jwt.decode(
+                auth_header.split(" ")[1],
+                settings.jwt_secret,
+                algorithms=["HS256"],
+            )
+            if payload.get("sub") is not None:
+                return f"user:{payload['sub']}"
+        except JWTError:
+            pass
+
+    return f"ip:{request.client.host if request.client else 'unknown'}"
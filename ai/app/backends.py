@@ -0,0 +1,198 @@
+"""
+Ollama backend pools with load balancing and failover.
+
+Chat and embedding traffic can each be spread over several Ollama hosts
+(`OLLAMA_HOSTS`, `EMBEDDING_HOSTS`, comma-separated). Requests go to the
+healthy backend with the fewest in-flight requests. A backend that fails
+`backend_eject_after` times in a row is ejected for `backend_eject_seconds`
+or until a health check succeeds. Connection-level failures are retried
+on another backend.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, List, TypeVar
+
+import httpx
+
+from app.clients import get_async_client
+from app.config import settings
+
+# ----------------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Failures that happen before Ollama produced anything and are safe to retry
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError)
+
+
+def _split_hosts(value: str) -> List[str]:
+    return [host.strip().rstrip("/") for host in value.split(",") if host.strip()]
+
+
+class Backend:
+    """One Ollama host and its load/health state."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.in_flight = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.total_requests = 0
+        self.total_failures = 0
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+
+    def get_stats(self) -> dict:
+        return {
+            "url": self.url,
+            "available": self.available,
+            "in_flight": self.in_flight,
+            "consecutive_failures": self.failures,
+            "requests": self.total_requests,
+            "failures": self.total_failures,
+        }
+
+
+class BackendPool:
+    """Least-loaded routing over a set of Ollama hosts."""
+
+    def __init__(self, urls: List[str], name: str = "ollama"):
+        self.name = name
+        self.backends = [Backend(url) for url in urls]
+        self._lock = threading.Lock()
+
+    def choose(self, exclude: set = frozenset()) -> Backend:
+        """Pick the available backend with the fewest in-flight requests."""
+        with self._lock:
+            candidates = [b for b in self.backends if b.url not in exclude] or self.backends
+            available = [b for b in candidates if b.available] or candidates
+            backend = min(available, key=lambda b: b.in_flight)
+            backend.in_flight += 1
+            backend.total_requests += 1
+            return backend
+
+    def release(self, backend: Backend, ok: bool) -> None:
+        """Return a backend after a request and record its outcome."""
+        with self._lock:
+            backend.in_flight -= 1
+            if ok:
+                backend.failures = 0
+            else:
+                self._record_failure(backend)
+
+    def _record_failure(self, backend: Backend) -> None:
+        backend.failures += 1
+        backend.total_failures += 1
+        if backend.failures >= settings.backend_eject_after:
+            backend.ejected_until = time.monotonic() + settings.backend_eject_seconds
+            logger.warning("Ejecting %s from %s pool for %ss", backend.url, self.name, settings.backend_eject_seconds)
+
+    @property
+    def attempts(self) -> int:
+        return min(len(self.backends), settings.backend_max_retries + 1)
+
+    async def request(self, send: Callable[[str], Awaitable[T]]) -> T:
+        """Run `send(base_url)`, failing over to another backend on connection errors."""
+        tried = set()
+        for attempt in range(self.attempts):
+            backend = self.choose(exclude=tried)
+            tried.add(backend.url)
+            try:
+                result = await send(backend.url)
+            except RETRYABLE_ERRORS as e:
+                self.release(backend, ok=False)
+                if attempt == self.attempts - 1:
+                    raise
+                logger.warning("%s failed (%r), retrying on another backend", backend.url, e)
+                continue
+            except httpx.HTTPStatusError as e:
+                self.release(backend, ok=e.response.status_code < 500)
+                raise
+            except BaseException:
+                self.release(backend, ok=True)
+                raise
+            self.release(backend, ok=True)
+            return result
+
+    def request_sync(self, send: Callable[[str], T]) -> T:
+        """Synchronous version of request()."""
+        tried = set()
+        for attempt in range(self.attempts):
+            backend = self.choose(exclude=tried)
+            tried.add(backend.url)
+            try:
+                result = send(backend.url)
+            except RETRYABLE_ERRORS as e:
+                self.release(backend, ok=False)
+                if attempt == self.attempts - 1:
+                    raise
+                logger.warning("%s failed (%r), retrying on another backend", backend.url, e)
+                continue
+            except httpx.HTTPStatusError as e:
+                self.release(backend, ok=e.response.status_code < 500)
+                raise
+            except BaseException:
+                self.release(backend, ok=True)
+                raise
+            self.release(backend, ok=True)
+            return result
+
+    async def check_health(self) -> None:
+        """Probe every backend; reinstate healthy ones, count failures for others."""
+        client = get_async_client()
+
+        async def probe(backend: Backend) -> None:
+            try:
+                response = await client.get(f"{backend.url}/api/version", timeout=settings.backend_health_timeout)
+                response.raise_for_status()
+            except httpx.HTTPError:
+                with self._lock:
+                    self._record_failure(backend)
+                return
+
+            with self._lock:
+                if not backend.available:
+                    logger.info("%s is healthy again", backend.url)
+                backend.failures = 0
+                backend.ejected_until = 0.0
+
+        await asyncio.gather(*(probe(b) for b in self.backends))
+
+    def get_stats(self) -> List[dict]:
+        with self._lock:
+            return [b.get_stats() for b in self.backends]
+
+
+# ----------------------------------------------------------------------
+
+chat_pool = BackendPool(_split_hosts(settings.ollama_hosts) or [settings.ollama_host], name="chat")
+
+_embedding_hosts = _split_hosts(settings.embedding_hosts)
+embedding_pool = BackendPool(_embedding_hosts, name="embedding") if _embedding_hosts else chat_pool
+
+
+async def health_check_loop() -> None:
+    """Periodically probe all pools (run as a background task)."""
+    pools = {id(p): p for p in (chat_pool, embedding_pool)}.values()
+    while True:
+        await asyncio.sleep(settings.backend_health_interval)
+        for pool in pools:
+            try:
+                await pool.check_health()
+            except Exception as e:
+                logger.warning("Health check failed: %s", e)
+
+
+def get_stats() -> dict:
+    """Backend state for /health."""
+    return {
+        "chat": chat_pool.get_stats(),
+        "embedding": embedding_pool.get_stats(),
+    }
@@ -0,0 +1,472 @@
+"""
+Key-value cache backends shared by the service's caches.
+
+The query embedding, rerank score, history summary and answer caches
+store bytes through one interface, in a namespace of their own with
+their own limits:
+
+    memory   per-process LRU (one copy per uvicorn worker)
+    sqlite   one SQLite database in WAL mode shared by every worker on the
+             host; entry, byte and TTL limits hold across processes
+
+Keys are hashed to 16 bytes and callers pack values compactly (float32
+arrays, structs, UTF-8), so an entry costs little more than its payload.
+A cache failure is never a request failure: a broken database reads as
+a miss, and writes that cannot get the lock in time are skipped.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from app import metrics
+from app.config import settings
+
+# ----------------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(*parts) -> bytes:
+    """16-byte cache key for a sequence of values."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.digest()
+
+
+class CacheBackend:
+    """One namespace of bytes values with LRU eviction and optional TTL."""
+
+    name: str
+
+    def __init__(self, namespace: str, max_entries: int = 0, max_bytes: int = 0, ttl: float = 0):
+        self.namespace = namespace
+        self.max_entries = max_entries  # 0 = unbounded
+        self.max_bytes = max_bytes
+        self.ttl = ttl  # Seconds, 0 disables expiry
+
+        # Counted per process
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        value = self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: bytes, value: bytes) -> None:
+        if self.max_bytes and len(key) + len(value) > self.max_bytes:
+            return
+        self._set(key, value)
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def _set(self, key: bytes, value: bytes) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: bytes) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def totals(self) -> Tuple[int, int]:
+        """(entries, bytes) currently stored in this namespace."""
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Wait until queued writes are applied (backends that write synchronously have none)."""
+
+    def get_stats(self) -> dict:
+        entries, size = self.totals()
+        total = self.hits + self.misses
+        return {
+            "backend": self.name,
+            "entries": entries,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def __len__(self) -> int:
+        return self.totals()[0]
+
+
+# ----------------------------------------------------------------------
+# In-process
+# ----------------------------------------------------------------------
+
+
+class MemoryCache(CacheBackend):
+    """LRU dict private to this process."""
+
+    name = "memory"
+
+    def __init__(self, namespace: str = "", max_entries: int = 0, max_bytes: int = 0, ttl: float = 0):
+        super().__init__(namespace, max_entries, max_bytes, ttl)
+        # key -> (expires_at or 0, value)
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _pop(self, key: bytes) -> None:
+        _, value = self._entries.pop(key)
+        self._bytes -= len(key) + len(value)
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at and time.monotonic() > expires_at:
+                self._pop(key)
+                self.evictions += 1
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key: bytes, value: bytes) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+            self._entries[key] = (expires_at, value)
+            self._bytes += len(key) + len(value)
+
+            while (
+                (self.max_entries and len(self._entries) > self.max_entries)
+                or (self.max_bytes and self._bytes > self.max_bytes)
+            ):
+                self._pop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, key: bytes) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def totals(self) -> Tuple[int, int]:
+        with self._lock:
+            return len(self._entries), self._bytes
+
+
+# ----------------------------------------------------------------------
+# Shared between processes
+# ----------------------------------------------------------------------
+
+# Per-namespace totals are kept by triggers, so limits can be checked
+# without scanning the table
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key BLOB NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    used_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS entries_lru ON entries (namespace, used_at);
+
+CREATE TABLE IF NOT EXISTS totals (
+    namespace TEXT PRIMARY KEY,
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    INSERT INTO totals (namespace, entries, bytes) VALUES (NEW.namespace, 1, NEW.size)
+    ON CONFLICT (namespace) DO UPDATE SET entries = entries + 1, bytes = bytes + NEW.size;
+END;
+
+CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries BEGIN
+    UPDATE totals SET bytes = bytes - OLD.size + NEW.size WHERE namespace = NEW.namespace;
+END;
+
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    UPDATE totals SET entries = entries - 1, bytes = bytes - OLD.size WHERE namespace = OLD.namespace;
+END;
+"""
+
+# Refresh an entry's LRU position at most this often
+TOUCH_INTERVAL = 1.0
+# Sets between sweeps for expired entries
+PURGE_EVERY = 256
+EVICT_BATCH = 64
+# Writes queued for the writer thread beyond this are dropped
+MAX_PENDING_WRITES = 1000
+
+# One writer thread per process, shared by every namespace: writes wait
+# for SQLite locks here, never on the event loop
+_writer: Optional[ThreadPoolExecutor] = None
+
+
+def _get_writer() -> ThreadPoolExecutor:
+    global _writer
+    if _writer is None:
+        _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-writer")
+    return _writer
+
+
+class SQLiteCache(CacheBackend):
+    """
+    LRU namespace in a WAL-mode SQLite file shared by every process on the host.
+
+    `get()` runs a single read-only SELECT, which WAL never blocks behind a
+    writer, so it is safe to call from the event loop. Sets, deletes and
+    LRU touches are handed to a background writer thread, which applies
+    the pending touches in a batch with the next write. Until a write is
+    committed, `get()` in this process answers from the queued value, so
+    a caller always reads its own writes.
+    """
+
+    name = "sqlite"
+
+    def __init__(
+        self,
+        namespace: str,
+        max_entries: int = 0,
+        max_bytes: int = 0,
+        ttl: float = 0,
+        path: str = None,
+    ):
+        super().__init__(namespace, max_entries, max_bytes, ttl)
+        self.path = path or settings.cache_path
+        self._local = threading.local()
+        self._sets = 0
+        self._pending = 0
+        # key -> last read time, waiting to be written as used_at
+        self._touched: Dict[bytes, float] = {}
+        self._touch_scheduled = False
+        # key -> value (None for a delete) queued but not yet committed
+        self._unwritten: Dict[bytes, Optional[bytes]] = {}
+        # Queued clear() calls: the database still holds the cleared entries
+        self._clearing = 0
+        self._lock = threading.Lock()
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._connect().executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """This thread's connection (a forked worker opens its own)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        conn = sqlite3.connect(self.path, timeout=settings.cache_busy_timeout, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # A cache may lose its last writes on power loss
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _failed(self, operation: str, error: sqlite3.Error) -> None:
+        metrics.increment("cache.errors")
+        logger.warning("Cache %s %s failed: %s", self.namespace, operation, error)
+
+    def _submit(self, fn, *args, done=None) -> bool:
+        """
+        Queue a write for the writer thread; False if the queue is full and it was dropped.
+
+        `done` runs once the write's transaction has ended, committed or not.
+        """
+        with self._lock:
+            if self._pending >= MAX_PENDING_WRITES:
+                metrics.increment("cache.dropped")
+                return False
+            self._pending += 1
+        _get_writer().submit(self._run_write, fn, args, done)
+        return True
+
+    def _run_write(self, fn, args: tuple, done) -> None:
+        try:
+            conn = self._connect()
+            # IMMEDIATE takes the write lock up front: the write and the
+            # eviction it triggers are atomic with respect to other workers
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._apply_touches(conn)
+                fn(conn, *args)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            self._failed("write", e)
+        finally:
+            with self._lock:
+                self._pending -= 1
+            if done is not None:
+                done()
+
+    def _submit_key(self, fn, key: bytes, value: Optional[bytes], *args) -> None:
+        """Queue a write of `key`; this process reads `value` for it until the write ends."""
+        with self._lock:
+            self._unwritten[key] = value
+
+        def settle():
+            # Keep the entry if a newer write to the key replaced it
+            with self._lock:
+                if key in self._unwritten and self._unwritten[key] is value:
+                    del self._unwritten[key]
+
+        if not self._submit(fn, key, value, *args, done=settle):
+            settle()
+
+    def _apply_touches(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            self._touch_scheduled = False
+        if touched:
+            conn.executemany(
+                "UPDATE entries SET used_at = ? WHERE namespace = ? AND key = ?",
+                [(used_at, self.namespace, key) for key, used_at in touched.items()],
+            )
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        with self._lock:
+            if key in self._unwritten:
+                return self._unwritten[key]
+            if self._clearing:
+                return None
+
+        now = time.time()
+        try:
+            row = self._connect().execute(
+                "SELECT value, expires_at, used_at FROM entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._failed("read", e)
+            return None
+        if row is None:
+            return None
+
+        value, expires_at, used_at = row
+        if expires_at and now > expires_at:
+            return None  # Deleted by the next purge or eviction
+        if now - used_at > TOUCH_INTERVAL:
+            with self._lock:
+                self._touched[key] = now
+                schedule = not self._touch_scheduled
+                self._touch_scheduled = True
+            if schedule:
+                self._submit(lambda conn: None)
+        return value
+
+    def _set(self, key: bytes, value: bytes) -> None:
+        self._submit_key(self._write, key, value, time.time())
+
+    def _write(self, conn: sqlite3.Connection, key: bytes, value: bytes, now: float) -> None:
+        self._sets += 1
+        conn.execute(
+            "INSERT INTO entries (namespace, key, value, size, expires_at, used_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (namespace, key) DO UPDATE SET"
+            " value = excluded.value, size = excluded.size,"
+            " expires_at = excluded.expires_at, used_at = excluded.used_at",
+            (self.namespace, key, value, len(key) + len(value), now + self.ttl if self.ttl else 0, now),
+        )
+        if self.ttl and self._sets % PURGE_EVERY == 0:
+            purged = conn.execute(
+                "DELETE FROM entries WHERE namespace = ? AND expires_at > 0 AND expires_at < ?",
+                (self.namespace, now),
+            ).rowcount
+            self.evictions += purged
+        self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Delete least recently used entries until the namespace is within its limits."""
+        while True:
+            entries, size = self._totals(conn)
+            over_entries = max(entries - self.max_entries, 0) if self.max_entries else 0
+            over_bytes = max(size - self.max_bytes, 0) if self.max_bytes else 0
+            if not over_entries and not over_bytes:
+                return
+
+            victims = []
+            for key, victim_size in conn.execute(
+                "SELECT key, size FROM entries WHERE namespace = ? ORDER BY used_at LIMIT ?",
+                (self.namespace, max(over_entries, EVICT_BATCH)),
+            ):
+                if len(victims) >= over_entries and over_bytes <= 0:
+                    break
+                victims.append((self.namespace, key))
+                over_bytes -= victim_size
+            if not victims:
+                return
+
+            conn.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", victims)
+            self.evictions += len(victims)
+
+    def _totals(self, conn: sqlite3.Connection) -> Tuple[int, int]:
+        row = conn.execute("SELECT entries, bytes FROM totals WHERE namespace = ?", (self.namespace,)).fetchone()
+        return tuple(row) if row else (0, 0)
+
+    def delete(self, key: bytes) -> None:
+        self._submit_key(lambda conn, key, value: conn.execute(
+            "DELETE FROM entries WHERE namespace = ? AND key = ?", (self.namespace, key),
+        ), key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._unwritten.clear()
+            self._clearing += 1
+
+        def cleared():
+            with self._lock:
+                self._clearing -= 1
+
+        if not self._submit(
+            lambda conn: conn.execute("DELETE FROM entries WHERE namespace = ?", (self.namespace,)),
+            done=cleared,
+        ):
+            cleared()
+
+    def flush(self) -> None:
+        """Block until every queued write has been applied (for scripts and tests)."""
+        _get_writer().submit(lambda: None).result()
+
+    def totals(self) -> Tuple[int, int]:
+        try:
+            return self._totals(self._connect())
+        except sqlite3.Error as e:
+            self._failed("stats", e)
+            return 0, 0
+
+
+# ----------------------------------------------------------------------
+
+
+def create_cache(namespace: str, max_entries: int = 0, max_bytes: int = 0, ttl: float = 0) -> CacheBackend:
+    """Open a cache namespace on the backend selected by `cache_backend`."""
+    if settings.cache_backend == "sqlite":
+        return SQLiteCache(namespace, max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+    if settings.cache_backend != "memory":
+        raise ValueError(f"Unknown cache_backend: {settings.cache_backend}")
+    return MemoryCache(namespace, max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
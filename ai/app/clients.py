@@ -0,0 +1,71 @@
+"""
+Shared HTTP clients for Ollama traffic.
+
+One pooled async client (request path) and one pooled sync client
+(ingestion scripts) are created lazily and reused, so token streams and
+embeddings ride on kept-alive connections instead of opening a new TCP
+connection per call. The FastAPI lifespan closes them on shutdown.
+"""
+
+import importlib.util
+import threading
+
+import httpx
+
+from app.config import settings
+
+# ----------------------------------------------------------------------
+
+_async_client: httpx.AsyncClient | None = None
+_sync_client: httpx.Client | None = None
+_sync_lock = threading.Lock()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.ollama_max_connections,
+        max_keepalive_connections=settings.ollama_max_keepalive_connections,
+        keepalive_expiry=settings.ollama_keepalive_expiry,
+    )
+
+
+def _http2_enabled() -> bool:
+    """HTTP/2 needs the optional `h2` package (httpx[http2])."""
+    return settings.ollama_http2 and importlib.util.find_spec("h2") is not None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the shared async client, creating it on first use."""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            limits=_limits(),
+            http2=_http2_enabled(),
+            timeout=settings.ollama_timeout,
+        )
+    return _async_client
+
+
+def get_sync_client() -> httpx.Client:
+    """Return the shared sync client, creating it on first use."""
+    global _sync_client
+    with _sync_lock:
+        if _sync_client is None or _sync_client.is_closed:
+            _sync_client = httpx.Client(
+                limits=_limits(),
+                http2=_http2_enabled(),
+                timeout=settings.ollama_timeout,
+            )
+        return _sync_client
+
+
+async def close_clients() -> None:
+    """Close the shared clients (called from the app lifespan)."""
+    global _async_client, _sync_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    with _sync_lock:
+        if _sync_client is not None:
+            _sync_client.close()
+            _sync_client = None
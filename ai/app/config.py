@@ -14,12 +14,58 @@ class Settings(BaseSettings):
     ollama_model: str = "qwen3:8b"  # Fast multilingual model with good Bulgarian support
     embedding_model: str = "nomic-embed-text"
 
+    # Ollama - multiple backends (comma-separated URLs, default: ollama_host)
+    ollama_hosts: str = ""  # Chat backends
+    embedding_hosts: str = ""  # Embedding backends (default: same pool as chat)
+    backend_max_retries: int = 2  # Failovers on connection errors
+    backend_eject_after: int = 3  # Consecutive failures before ejecting a host
+    backend_eject_seconds: float = 30.0
+    backend_health_interval: float = 10.0
+    backend_health_timeout: float = 2.0
+
+    # Ollama - HTTP connection pool
+    ollama_max_connections: int = 100
+    ollama_max_keepalive_connections: int = 20
+    ollama_keepalive_expiry: float = 30.0  # Seconds an idle connection is kept
+    ollama_http2: bool = True  # Used only when the `h2` package is installed
+    ollama_timeout: float = 300.0
+    ollama_num_ctx: int = 32768  # Context window requested for chat
+    ollama_keep_alive: str = "30m"  # How long Ollama keeps a model loaded after a request ("-1" = forever)
+
+    # Embeddings - batched requests via /api/embed
+    embedding_batching: bool = True  # Falls back to /api/embeddings on older servers
+    embedding_batch_size: int = 32
+    embedding_concurrency: int = 4  # Batches in flight at once
+    embedding_timeout: float = 120.0
+
+    # Embeddings - query embedding cache
+    embedding_cache_enabled: bool = True
+    embedding_cache_max_entries: int = 10000
+    embedding_cache_max_bytes: int = 64 * 1024 * 1024
+    embedding_cache_ttl: float = 24 * 60 * 60  # Seconds, 0 disables expiry
+
     # JWT
     jwt_secret: str = ""
 
     # Server
     host: str = "0.0.0.0"
     port: int = 8000
+    workers: int = 1  # uvicorn worker processes (run.py reloads on changes only with 1)
+    # Note: llm_max_concurrent and llm_max_queue apply per worker
+
+    # Cache backend for the embedding, rerank score, history summary and answer caches
+    # ("memory" per process, or "sqlite" shared by every worker on the host)
+    cache_backend: str = "memory"
+    cache_path: str = str(BASE_DIR / "data" / "cache.sqlite3")
+    cache_busy_timeout: float = 0.1  # Seconds a write waits for another worker before skipping
+
+    # Startup warm-up (/health reports 503 until it has finished)
+    warmup_enabled: bool = True
+    warmup_query: str = "Как да кандидатствам в ЕСКИЗ?"  # Retrieval run once to warm the index
+
+    # Logging
+    log_level: str = "INFO"
+    log_sample_rate: float = 0.1  # Share of requests whose per-request details are logged
 
     # CORS
     frontend_url: str = "http://localhost:3000"
@@ -27,15 +73,89 @@ class Settings(BaseSettings):
     # RAG - ChromaDB
     chroma_persist_dir: str = str(BASE_DIR / "data" / "chroma_db")
     chroma_collection_name: str = "eda_knowledge_base"
+    ingest_manifest_path: str = str(BASE_DIR / "data" / "ingest_manifest.json")
+
+    # RAG - Index versions (ingestion publishes a new collection through this pointer)
+    index_pointer_path: str = str(BASE_DIR / "data" / "index_pointer.json")
+    index_watch_interval: float = 5.0  # Seconds between pointer checks, 0 disables the watcher
+    index_keep_versions: int = 3  # Newest versions ingestion keeps on disk, the live one included
+
+    # RAG - Vector store backend ("chroma", or "numpy" for exact in-process search)
+    vector_backend: str = "chroma"
+    numpy_persist_dir: str = str(BASE_DIR / "data" / "numpy_index")
+    numpy_dtype: str = "float32"  # float32, float16 or int8 (per-row scaled)
+    numpy_block_size: int = 65536  # Rows scored per block; 0 scores all rows at once
 
     # RAG - Document processing
     documents_dir: str = str(BASE_DIR / "data" / "documents")
     chunk_size: int = 1000
     chunk_overlap: int = 200
 
+    # RAG - Parallel ingestion (scripts/ingest.py --parallel)
+    ingest_parse_workers: int = 4  # Processes loading and chunking files
+    ingest_queue_size: int = 1000  # Chunks buffered between parsing and embedding
+
     # RAG - Retrieval
     top_k_results: int = 8
     similarity_threshold: float = 0.3  # No filtering - let the LLM use all retrieved context
+    vectorstore_max_workers: int = 4  # Threads for blocking ChromaDB calls
+
+    # RAG - Hybrid lexical + vector retrieval
+    hybrid_search: bool = True
+    bm25_index_path: str = str(BASE_DIR / "data" / "bm25_index.json")
+    hybrid_candidates: int = 20  # Candidates fetched from each index before fusion
+    rrf_k: int = 60  # Reciprocal-rank fusion constant
+
+    # RAG - Reranking (retrieve rerank_candidates, keep the best rerank_top_k)
+    rerank_enabled: bool = False
+    rerank_backend: str = "cross-encoder"  # "cross-encoder" (sentence-transformers) or "ollama"
+    rerank_model: str = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"  # Multilingual
+    rerank_ollama_model: str = ""  # Default: ollama_model
+    rerank_candidates: int = 20
+    rerank_top_k: int = 4
+    rerank_batch_size: int = 16
+    rerank_budget_ms: float = 1500.0  # Fall back to retrieval order after this
+    rerank_grace_ms: float = 5000.0  # Cancel scoring still running this long after the budget
+    rerank_max_concurrent: int = 1  # Ollama scoring calls at once, each in a background-priority LLM slot
+    rerank_max_chars: int = 1500  # Passage length sent to the Ollama scorer
+    rerank_cache_size: int = 20000  # Cached (query, chunk) scores
+
+    # RAG - Batch search (POST /search/batch)
+    search_batch_max_queries: int = 1000
+    search_batch_size: int = 64  # Queries retrieved together; larger requests stream NDJSON
+
+    # RAG - Context assembly
+    context_budget_ratio: float = 0.25  # Share of ollama_num_ctx for retrieved context
+    context_duplicate_threshold: float = 0.8  # Shingle overlap at which a passage is dropped
+
+    # Single-flight: identical concurrent work runs once and is shared
+    singleflight_enabled: bool = True  # Query embeddings and retrieval
+    singleflight_generation: bool = False  # Fan one generation out to requests with the same prompt
+
+    # LLM admission control
+    llm_max_concurrent: int = 4  # Generations running against Ollama at once
+    llm_max_queue: int = 32  # Requests allowed to wait for a slot
+
+    # Chat generation limits
+    max_generation_seconds: float = 120.0
+    max_generation_tokens: int = 2048
+    disconnect_check_interval: float = 0.5  # Seconds between client disconnect checks
+
+    # SSE token coalescing (0 ms sends one event per token)
+    sse_coalesce_ms: float = 25.0  # Longest a token waits for others to join its event
+    sse_coalesce_bytes: int = 512  # Flush early once an event holds this much text
+
+    # Chat history compaction
+    history_compaction: bool = True
+    history_keep_turns: int = 4  # Recent user/assistant turns kept verbatim
+    history_summary_max_tokens: int = 512
+    history_summary_cache_size: int = 1000  # Conversations with a cached summary
+
+    # Semantic answer cache for single-turn questions
+    answer_cache_enabled: bool = False
+    answer_cache_max_entries: int = 1000
+    answer_cache_max_distance: float = 0.05  # Cosine distance between questions
+    answer_cache_ttl: float = 6 * 60 * 60  # Seconds, 0 disables expiry
 
     class Config:
         env_file = ".env"
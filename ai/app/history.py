@@ -0,0 +1,136 @@
+"""
+Conversation history compaction.
+
+The last `history_keep_turns` turns are forwarded verbatim; older turns
+are folded into a rolling summary produced with `chat_complete` once
+another `history_keep_turns` turns have accumulated. Summaries are cached
+per conversation and extended incrementally, so each old message is
+summarized only once. With the shared cache backend, every worker sees
+the same summaries.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import struct
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from app.cachestore import create_cache, make_key
+from app.config import settings
+from app.ollama import chat_complete
+from app.rag.context import estimate_tokens
+from app.scheduler import PRIORITY_BACKGROUND, llm_scheduler
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------------------------------------------------
+
+SUMMARY_PROMPT = """Обобщи накратко разговора по-долу между потребител и асистента Еда за системата ЕСКИЗ.
+Запази всички конкретни факти: имена, дати, срокове, имейли, адреси, документи и въпроси, на които още няма отговор.
+Пиши на езика на разговора. Не добавяй нова информация.
+
+{previous}РАЗГОВОР:
+{transcript}"""
+
+# Cached summary: messages covered, fingerprint of them, then the UTF-8 summary
+_SUMMARY_HEADER = struct.Struct("<I20s")
+
+
+def _fingerprint(messages: List[dict]) -> bytes:
+    data = json.dumps([(m["role"], m["content"]) for m in messages], ensure_ascii=False)
+    return hashlib.sha1(data.encode("utf-8")).digest()
+
+
+def count_tokens(messages: List[dict]) -> int:
+    """Estimated prompt tokens for a list of chat messages."""
+    return sum(estimate_tokens(m["content"]) + 4 for m in messages)
+
+
+class HistoryManager:
+    """Keep recent turns verbatim and summarize older ones."""
+
+    def __init__(self, keep_turns: int = None, max_cached: int = None):
+        self.keep_turns = keep_turns or settings.history_keep_turns
+        self.max_cached = max_cached or settings.history_summary_cache_size
+
+        self._summaries = create_cache("history", max_entries=self.max_cached)
+        # Per process: two workers may still summarize the same turns at once
+        self._locks: OrderedDict = OrderedDict()
+
+    def _key(self, messages: List[dict], conversation_id: Optional[str]) -> bytes:
+        # Without a session id, the opening message identifies the conversation
+        return make_key(conversation_id or _fingerprint(messages[:1]).hex())
+
+    def _load(self, key: bytes) -> Tuple[int, Optional[bytes], Optional[str]]:
+        value = self._summaries.get(key)
+        if value is None:
+            return 0, None, None
+        covered, fingerprint = _SUMMARY_HEADER.unpack_from(value)
+        return covered, fingerprint, value[_SUMMARY_HEADER.size:].decode("utf-8")
+
+    def _lock(self, key: bytes) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._locks.move_to_end(key)
+        while len(self._locks) > self.max_cached:
+            self._locks.popitem(last=False)
+        return lock
+
+    async def _summarize(self, previous: Optional[str], messages: List[dict]) -> str:
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        prompt = SUMMARY_PROMPT.format(
+            previous=f"ДОСЕГАШНО ОБОБЩЕНИЕ:\n{previous}\n\n" if previous else "",
+            transcript=transcript,
+        )
+        # Summaries yield to interactive generations
+        async with llm_scheduler.slot("history", priority=PRIORITY_BACKGROUND):
+            return await chat_complete(
+                [{"role": "user", "content": prompt}],
+                options={"temperature": 0.0, "num_predict": settings.history_summary_max_tokens},
+            )
+
+    async def compact(
+        self,
+        messages: List[dict],
+        conversation_id: str = None,
+    ) -> Tuple[Optional[str], List[dict]]:
+        """
+        Split a conversation into a summary of old turns and recent messages.
+
+        Returns:
+            (summary or None, messages to forward verbatim)
+        """
+        keep = self.keep_turns * 2
+        if len(messages) <= keep:
+            return None, messages
+
+        older, recent = messages[:-keep], messages[-keep:]
+        key = self._key(messages, conversation_id)
+
+        async with self._lock(key):
+            covered, fingerprint, summary = self._load(key)
+
+            if covered and (covered > len(older) or _fingerprint(older[:covered]) != fingerprint):
+                # History was edited or belongs to another conversation
+                covered, summary = 0, None
+
+            # Summarize in steps of keep_turns, so a summary call happens once
+            # every few turns rather than on every request
+            pending = older[covered:]
+            if len(pending) >= keep:
+                try:
+                    summary = await self._summarize(summary, pending)
+                    self._summaries.set(
+                        key,
+                        _SUMMARY_HEADER.pack(len(older), _fingerprint(older)) + summary.encode("utf-8"),
+                    )
+                    logger.info("Summarized %d new messages (%d total)", len(pending), len(older))
+                    pending = []
+                except Exception as e:
+                    # Forward the unsummarized messages verbatim and retry next turn
+                    logger.warning("Summarization failed: %s", e)
+
+        return summary, pending + recent
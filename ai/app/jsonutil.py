@@ -0,0 +1,75 @@
+"""
+JSON encoding/decoding for the streaming hot path.
+
+Uses orjson when it is installed and falls back to the standard library
+otherwise. Both produce compact, non-ASCII-escaped output, so the bytes
+on the wire are the same whichever backend is active.
+"""
+
+import json
+from typing import Any, AsyncIterator
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+# ----------------------------------------------------------------------
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+if orjson is not None:
+
+    def loads(data: bytes | str) -> Any:
+        """Parse JSON from bytes or str."""
+        return orjson.loads(data)
+
+    def dumps_bytes(obj: Any) -> bytes:
+        """Serialize to compact UTF-8 JSON bytes."""
+        return orjson.dumps(obj)
+
+    def dumps(obj: Any) -> str:
+        """Serialize to a compact JSON string."""
+        return orjson.dumps(obj).decode("utf-8")
+
+else:
+
+    # json.dumps() with non-default options builds a new encoder per call
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def loads(data: bytes | str) -> Any:
+        """Parse JSON from bytes or str."""
+        # json.loads() on bytes sniffs the encoding first; Ollama sends UTF-8
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        return json.loads(data)
+
+    def dumps_bytes(obj: Any) -> bytes:
+        """Serialize to compact UTF-8 JSON bytes."""
+        return dumps(obj).encode("utf-8")
+
+    def dumps(obj: Any) -> str:
+        """Serialize to a compact JSON string."""
+        return _encoder.encode(obj)
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """
+    Parse newline-delimited JSON from a byte stream.
+
+    Lines are split and parsed as bytes, skipping the per-line text decode
+    that `aiter_lines()` would do before parsing.
+    """
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        if b"\n" not in buffer:
+            continue
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield loads(line)
+
+    if buffer.strip():
+        yield loads(buffer)
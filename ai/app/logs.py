@@ -0,0 +1,45 @@
+"""
+Logging setup.
+
+Records are handed to a queue and written by a background thread, so a
+log call on the request path never blocks on stderr. Per-request detail
+is logged for a sample of requests only (`log_sample_rate`); warnings
+and errors are always logged.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import random
+
+from app.config import settings
+
+# ----------------------------------------------------------------------
+
+_listener = None
+
+
+def setup_logging() -> None:
+    """Route `app.*` loggers through a non-blocking queue handler (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return
+
+    records: queue.Queue = queue.Queue(-1)
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+
+    _listener = logging.handlers.QueueListener(records, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    logger = logging.getLogger("app")
+    logger.setLevel(settings.log_level.upper())
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    logger.propagate = False
+
+
+def sampled() -> bool:
+    """True for the share of requests whose details should be logged."""
+    return random.random() < settings.log_sample_rate
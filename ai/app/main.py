@@ -3,23 +3,73 @@ Eda AI Service - RAG-powered chat for ЕСКИЗ.
 Uses vector search to retrieve relevant documentation.
 """
 
-import json
+import asyncio
+import hashlib
+import logging
+import time
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+_imports_started = time.perf_counter()
+
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from sse_starlette.sse import EventSourceResponse
 
+from app import backends
+from app.answer_cache import AnswerCache
+from app.auth import get_user_key, verify_token
+from app.clients import close_clients
 from app.config import settings
-from app.schemas import ChatRequest
+from app.history import HistoryManager, count_tokens
+from app import jsonutil, logs, metrics
+from app.scheduler import QueueFullError, llm_scheduler
+from app.schemas import ChatRequest, SearchBatchRequest
+from app.singleflight import StreamFlights
+from app.startup import startup, warm_up
+from app.streaming import coalesce
 from app.ollama import chat_stream
 from app.rag import Retriever
+from app.rag.cache import query_embedding_cache
+from app.rag.vectorstore import run_blocking
 
 # ----------------------------------------------------------------------
 
+startup.imports_done(_imports_started)
+logs.setup_logging()
+logger = logging.getLogger(__name__)
+
+# Opened in lifespan(), not at import time
+retriever: Retriever = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Open the index, then warm up, run backend health checks and the index
+    watcher in the background; release pooled Ollama connections on shutdown.
+    """
+    global retriever
+    with startup.stage("open_index"):
+        retriever = await run_blocking(Retriever)
+
+    tasks = [
+        asyncio.create_task(warm_up(retriever)),
+        asyncio.create_task(backends.health_check_loop()),
+    ]
+    if settings.index_watch_interval > 0:
+        tasks.append(asyncio.create_task(retriever.watch()))
+    yield
+    for task in tasks:
+        task.cancel()
+    await close_clients()
+
+
 app = FastAPI(
     title="Eda AI Service",
     description="AI chat service for Bulgarian university applications",
     version="2.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -30,8 +80,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize RAG retriever
-retriever = Retriever()
+# Summarizes old turns of long conversations
+history_manager = HistoryManager() if settings.history_compaction else None
+
+# Optional semantic cache of answers to single-turn questions
+answer_cache = AnswerCache() if settings.answer_cache_enabled else None
+
+# Requests with the same full prompt share one generation
+generation_flights = StreamFlights("generation") if settings.singleflight_generation else None
 
 # ----------------------------------------------------------------------
 # System Prompt
@@ -68,23 +124,66 @@ SYSTEM_PROMPT_TEMPLATE = """Ти си Еда - AI асистент за сист
 
 @app.get("/health")
 async def health_check():
-    """Health check."""
-    stats = retriever.vectorstore.get_stats()
+    """Readiness: 503 until the index is open and the models are warm."""
+    if not startup.ready:
+        return JSONResponse(status_code=503, content={"status": "starting", "startup": startup.get_stats()})
+
+    stats = await run_blocking(retriever.vectorstore.get_stats)
     return {
         "status": "healthy",
+        "startup": startup.get_stats(),
         "vectorstore": stats,
+        "index": retriever.index_info(),
+        "embedding_cache": query_embedding_cache.get_stats(),
+        "answer_cache": answer_cache.get_stats() if answer_cache else None,
+        "generation": metrics.snapshot("generation."),
+        "scheduler": llm_scheduler.get_stats(),
+        "backends": backends.get_stats(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Counters and stage/generation histograms in Prometheus text format."""
+    scheduler = llm_scheduler.get_stats()
+    gauges = {
+        "scheduler_active": scheduler["active"],
+        "scheduler_queued": scheduler["queued"],
+        "embedding_cache_entries": query_embedding_cache.get_stats().get("entries", 0),
     }
+    return PlainTextResponse(
+        metrics.render_prometheus(gauges),
+        media_type="text/plain; version=0.0.4",
+    )
 
 
 @app.post("/chat")
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
     """Stream chat response with RAG context."""
 
+    user_key = get_user_key(http_request)
+    timings = metrics.start_timings()
+    log_details = logs.sampled()
+
     # Get the user's question
     user_message = request.messages[-1].content if request.messages else ""
 
     # Retrieve relevant context from vector store
-    context = retriever.get_context(user_message)
+    results = await retriever.retrieve(user_message)
+    context = retriever.format_context(results)
+
+    # Look up a previous answer to (nearly) the same question and context
+    use_answer_cache = (
+        answer_cache is not None
+        and not request.bypass_cache
+        and len(request.messages) == 1
+    )
+    cached_answer = None
+    if use_answer_cache:
+        query_embedding = (await retriever.vectorstore.embedding_function.embed_query_async(user_message))[0]
+        chunk_ids = [r["id"] for r in results]
+        index_version = await run_blocking(retriever.vectorstore.index_version)
+        cached_answer = answer_cache.lookup(query_embedding, chunk_ids, index_version)
 
     if not context:
         context = "Няма намерена релевантна информация в документацията."
@@ -98,24 +197,217 @@ async def chat(request: ChatRequest):
         {"role": "assistant", "content": "Разбирам. Ще отговарям само с информация от документацията за ЕСКИЗ."},
     ]
 
-    for msg in request.messages:
-        messages.append({"role": msg.role, "content": msg.content})
-
-    # Debug logging
-    print(f"\n[Chat] User: {user_message[:100]}...")
-    print(f"[Chat] Context length: {len(context)} chars")
+    history = [{"role": msg.role, "content": msg.content} for msg in request.messages]
+    history_tokens = count_tokens(history)
+
+    if history_manager is not None:
+        with metrics.timed("history"):
+            summary, history = await history_manager.compact(history, request.session_id)
+        if summary:
+            messages.append({"role": "system", "content": f"ОБОБЩЕНИЕ НА ПРЕДИШНИЯ РАЗГОВОР:\n{summary}"})
+
+    messages.extend(history)
+
+    if log_details:
+        logger.info(
+            "User: %s... | context %d chars | prompt ~%d tokens "
+            "(system %d, history %d -> %d, %d -> %d messages)",
+            user_message[:100], len(context), count_tokens(messages),
+            count_tokens(messages[:1]), history_tokens, count_tokens(messages[2:]),
+            len(request.messages), len(history),
+        )
+
+    def done_event(answer_parts: list, finish_reason: str = None, first_token_at: float = None, ended_at: float = None) -> dict:
+        """Final event, carrying per-stage timings (Server-Timing style, in ms)."""
+        payload = {}
+        if finish_reason is not None:
+            payload["finish_reason"] = finish_reason
+
+        tokens = len(answer_parts)
+        payload["tokens"] = tokens
+        if first_token_at is not None and ended_at is not None and ended_at > first_token_at and tokens > 1:
+            payload["tokens_per_second"] = round((tokens - 1) / (ended_at - first_token_at), 1)
+        payload["timings"] = metrics.timings_ms(timings)
+
+        if log_details:
+            logger.info("Done: %s", payload)
+        return {"event": "done", "data": jsonutil.dumps(payload)}
+
+    # Whether this request runs the generation itself or follows a shared
+    # one, and when its LLM slot was granted
+    generation = {"leader": False, "follower": False, "slot_granted_at": None}
+
+    def count(outcome: str) -> None:
+        """generation.<outcome> once per upstream generation; followers count as generation.shared_<outcome>."""
+        metrics.increment(f"generation.shared_{outcome}" if generation["follower"] else f"generation.{outcome}")
+
+    async def generate():
+        """Tokens for this prompt, generated while holding an LLM slot."""
+        async with llm_scheduler.slot(user_key) as waited:
+            generation["slot_granted_at"] = time.monotonic()
+            metrics.record("queue", waited, timings)
+            if waited and log_details:
+                logger.info("Waited %.2fs for an LLM slot", waited)
+
+            count("started")
+            tokens = chat_stream(messages, max_tokens=settings.max_generation_tokens)
+            try:
+                async for token in tokens:
+                    yield token
+            finally:
+                await tokens.aclose()
+
+    def lead():
+        generation["leader"] = True
+        return generate()
+
+    def token_stream():
+        if generation_flights is None:
+            return lead()
+        # Late joiners replay the tokens generated so far, then follow along
+        key = hashlib.sha256(jsonutil.dumps_bytes([messages, settings.max_generation_tokens])).hexdigest()
+        stream = generation_flights.subscribe(key, lead)
+        if not generation["leader"]:
+            generation["follower"] = True
+            count("started")
+        return stream
+
+    def generation_deadline(requested_at: float):
+        """When max_generation_seconds runs out; None while still queued for a slot."""
+        if not generation["leader"]:
+            return requested_at + settings.max_generation_seconds
+        if generation["slot_granted_at"] is None:
+            return None
+        return generation["slot_granted_at"] + settings.max_generation_seconds
 
     async def event_generator():
+        generating = False
         try:
-            async for chunk in chat_stream(messages):
+            if cached_answer is not None:
+                if log_details:
+                    logger.info("Answer cache hit")
                 yield {
                     "event": "message",
-                    "data": json.dumps({"content": chunk}),
+                    "data": jsonutil.dumps({"content": cached_answer}),
+                }
+                yield done_event([cached_answer])
+                return
+
+            answer_parts = []
+            first_token_at = None
+            try:
+                generating = True
+                finish_reason = None
+                started = time.monotonic()
+                requested_at = started
+                send_seconds = 0.0
+                stream = coalesce(token_stream())
+                next_batch = None
+                try:
+                    while True:
+                        # Wait for the next batch in short steps, so a backend that
+                        # stalls (before or between tokens) still hits the deadline
+                        if next_batch is None:
+                            next_batch = asyncio.ensure_future(stream.__anext__())
+                        await asyncio.wait({next_batch}, timeout=max(settings.disconnect_check_interval, 0.05))
+                        now = time.monotonic()
+                        if not next_batch.done():
+                            deadline = generation_deadline(requested_at)
+                            if deadline is not None and now >= deadline:
+                                finish_reason = "time_limit"
+                                break
+                            if await http_request.is_disconnected():
+                                finish_reason = "disconnected"
+                                break
+                            continue
+
+                        try:
+                            batch = next_batch.result()
+                        except StopAsyncIteration:
+                            break
+                        next_batch = None
+
+                        if first_token_at is None:
+                            first_token_at = now
+                            # Time to first token counts from when a slot was granted
+                            started += timings.get("queue", 0.0)
+                            next_disconnect_check = now + settings.disconnect_check_interval
+                            metrics.record("ttft", now - started, timings)
+
+                        if now >= next_disconnect_check:
+                            next_disconnect_check = now + settings.disconnect_check_interval
+                            if await http_request.is_disconnected():
+                                finish_reason = "disconnected"
+                                break
+
+                        answer_parts.extend(batch)
+                        yield {
+                            "event": "message",
+                            "data": jsonutil.dumps({"content": "".join(batch)}),
+                        }
+                        # Time until the consumer asked for the next event,
+                        # i.e. how long writing this one to the socket took
+                        send_seconds += time.monotonic() - now
+
+                        deadline = generation_deadline(requested_at)
+                        if deadline is not None and now >= deadline:
+                            finish_reason = "time_limit"
+                            break
+                        if len(answer_parts) >= settings.max_generation_tokens:
+                            finish_reason = "token_limit"
+                            break
+                finally:
+                    if next_batch is not None and not next_batch.done():
+                        next_batch.cancel()
+                        await asyncio.wait({next_batch})
+                        if not next_batch.cancelled():
+                            next_batch.exception()  # Retrieve it, so it is not logged as unhandled
+                    # Closing the stream closes the Ollama response and stops generation
+                    # (a shared generation stops once its last subscriber is gone)
+                    await stream.aclose()
+                    ended_at = time.monotonic()
+                    metrics.record("generation", ended_at - started, timings)
+                    metrics.record("sse_send", send_seconds, timings)
+                    metrics.generation_tokens.observe(len(answer_parts))
+                    if first_token_at is not None and ended_at > first_token_at and len(answer_parts) > 1:
+                        metrics.generation_tokens_per_second.observe(
+                            (len(answer_parts) - 1) / (ended_at - first_token_at)
+                        )
+            except QueueFullError as e:
+                logger.warning("Queue full, rejecting request (retry after %.0fs)", e.retry_after)
+                yield {
+                    "event": "error",
+                    "retry": int(e.retry_after * 1000),
+                    "data": jsonutil.dumps({"error": str(e), "retry_after": round(e.retry_after)}),
                 }
-            yield {"event": "done", "data": json.dumps({})}
+                return
+
+            if finish_reason == "disconnected":
+                logger.info("Client disconnected after %d tokens, generation cancelled", len(answer_parts))
+                count("cancelled")
+                return
+
+            if finish_reason is not None:
+                logger.warning("Generation aborted (%s) after %d tokens", finish_reason, len(answer_parts))
+                count("aborted")
+                yield done_event(answer_parts, finish_reason, first_token_at, ended_at)
+                return
+
+            count("completed")
+            if use_answer_cache:
+                answer_cache.store(query_embedding, chunk_ids, "".join(answer_parts), index_version)
+
+            yield done_event(answer_parts, None, first_token_at, ended_at)
+        except asyncio.CancelledError:
+            # sse-starlette cancels the generator when the client goes away
+            if generating:
+                logger.info("Client disconnected, generation cancelled")
+                count("cancelled")
+            raise
         except Exception as e:
-            print(f"[Chat] Error: {e}")
-            yield {"event": "error", "data": json.dumps({"error": str(e)})}
+            logger.exception("Chat failed: %s", e)
+            count("failed")
+            yield {"event": "error", "data": jsonutil.dumps({"error": str(e)})}
 
     return EventSourceResponse(event_generator())
 
@@ -123,21 +415,64 @@ async def chat(request: ChatRequest):
 @app.get("/knowledge")
 async def get_knowledge():
     """Show vector store statistics."""
-    stats = retriever.vectorstore.get_stats()
-    sources = retriever.vectorstore.list_documents()
+    stats = await run_blocking(retriever.vectorstore.get_stats)
+    sources = await run_blocking(retriever.vectorstore.list_documents)
     return {
         "stats": stats,
         "sources": sources,
     }
 
 
+@app.post("/admin/reload-index")
+async def reload_index(_: dict = Depends(verify_token)):
+    """Switch to the index version most recently published by ingestion."""
+    reloaded = await retriever.reload()
+    return {"reloaded": reloaded, "index": retriever.index_info()}
+
+
 @app.get("/search")
 async def search(query: str, top_k: int = 5):
     """Test search endpoint for debugging."""
-    results = retriever.get_context_with_sources(query, top_k=top_k)
+    results = await retriever.get_context_with_sources(query, top_k=top_k)
     return results
 
 
+@app.post("/search/batch")
+async def search_batch(request: SearchBatchRequest):
+    """Sources and scores for many queries; large batches stream as NDJSON."""
+    queries = request.queries
+    if len(queries) > settings.search_batch_max_queries:
+        raise HTTPException(status_code=413, detail=f"At most {settings.search_batch_max_queries} queries per batch")
+
+    def item(i: int, query: str, results: list) -> dict:
+        entry = {"index": i, "query": query, "sources": retriever.sources(results)}
+        if request.include_context:
+            entry["context"] = retriever.format_context(results)
+        return entry
+
+    stream = request.stream if request.stream is not None else len(queries) > settings.search_batch_size
+    if not stream:
+        found = await retriever.retrieve_many(queries, top_k=request.top_k)
+        return {"results": [item(i, q, r) for i, (q, r) in enumerate(zip(queries, found))]}
+
+    async def ndjson_lines():
+        # One line per query, sent as each group of search_batch_size is retrieved
+        size = settings.search_batch_size
+        try:
+            for start in range(0, len(queries), size):
+                group = queries[start:start + size]
+                found = await retriever.retrieve_many(group, top_k=request.top_k)
+                yield b"".join(
+                    jsonutil.dumps_bytes(item(start + i, q, r)) + b"\n"
+                    for i, (q, r) in enumerate(zip(group, found))
+                )
+        except Exception as e:
+            logger.exception("Batch search failed: %s", e)
+            yield jsonutil.dumps_bytes({"error": str(e)}) + b"\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
 # ----------------------------------------------------------------------
 
 if __name__ == "__main__":
@@ -0,0 +1,164 @@
+"""
+In-process metrics: counters and histograms.
+
+Counters are reported on /health; counters and histograms are exported in
+the Prometheus text format on /metrics. Stage timings are also collected
+per request (see `start_timings`) so /chat can report them to the client.
+"""
+
+import bisect
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
+
+# ----------------------------------------------------------------------
+
+PREFIX = "eda_"
+
+_counters: Counter = Counter()
+_lock = threading.Lock()
+
+
+def increment(name: str, value: int = 1) -> None:
+    """Increase a named counter."""
+    with _lock:
+        _counters[name] += value
+
+
+def snapshot(prefix: str = "") -> dict:
+    """Current counter values, optionally only those starting with prefix."""
+    with _lock:
+        return {
+            name[len(prefix):]: value
+            for name, value in sorted(_counters.items())
+            if name.startswith(prefix)
+        }
+
+
+# ----------------------------------------------------------------------
+# Histograms
+# ----------------------------------------------------------------------
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+RATE_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 200)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with an optional label, Prometheus style."""
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...], label: str = None):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.label = label
+        # label value -> (bucket counts, sum, count)
+        self._series: Dict[Optional[str], list] = {}
+
+    def observe(self, value: float, label: str = None) -> None:
+        with _lock:
+            series = self._series.get(label)
+            if series is None:
+                series = self._series[label] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        """Prometheus text-format lines for this histogram."""
+        name = PREFIX + self.name
+        lines = [f"# HELP {name} {self.help}", f"# TYPE {name} histogram"]
+        with _lock:
+            series = sorted(self._series.items(), key=lambda item: item[0] or "")
+            series = [(label, list(counts), total, count) for label, (counts, total, count) in series]
+
+        for label, counts, total, count in series:
+            labels = f'{self.label}="{label}",' if self.label and label is not None else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{{labels}le="{bound:g}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels}le="+Inf"}} {count}')
+            suffix = "{" + labels.rstrip(",") + "}" if labels else ""
+            lines.append(f"{name}_sum{suffix} {total:.6f}")
+            lines.append(f"{name}_count{suffix} {count}")
+        return lines
+
+
+stage_seconds = Histogram(
+    "stage_seconds",
+    "Time spent in each request stage (embed, search, lexical, context, history, queue, ttft, generation, sse_send).",
+    LATENCY_BUCKETS,
+    label="stage",
+)
+generation_tokens = Histogram("generation_tokens", "Tokens streamed per answer.", TOKEN_BUCKETS)
+generation_tokens_per_second = Histogram(
+    "generation_tokens_per_second", "Streaming rate after the first token.", RATE_BUCKETS
+)
+
+_histograms = (stage_seconds, generation_tokens, generation_tokens_per_second)
+
+
+# ----------------------------------------------------------------------
+# Per-request stage timings
+# ----------------------------------------------------------------------
+
+_timings: ContextVar[Optional[dict]] = ContextVar("timings", default=None)
+
+
+def start_timings() -> dict:
+    """Start collecting stage timings for the current request."""
+    timings: dict = {}
+    _timings.set(timings)
+    return timings
+
+
+def record(stage: str, seconds: float, timings: dict = None) -> None:
+    """Observe a stage duration, adding it to the request's timings if any."""
+    stage_seconds.observe(seconds, stage)
+    if timings is None:
+        timings = _timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage: str, timings: dict = None) -> Iterator[None]:
+    """Time the block as `stage`."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started, timings)
+
+
+def timings_ms(timings: dict) -> dict:
+    """Stage timings in milliseconds, like the Server-Timing `dur` field."""
+    return {stage: round(seconds * 1000, 1) for stage, seconds in timings.items()}
+
+
+# ----------------------------------------------------------------------
+# Export
+# ----------------------------------------------------------------------
+
+
+def render_prometheus(gauges: dict = None) -> str:
+    """All counters, histograms and the given gauges in Prometheus text format."""
+    lines = []
+    for name, value in snapshot().items():
+        metric = PREFIX + name.replace(".", "_") + "_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+
+    for name, value in (gauges or {}).items():
+        metric = PREFIX + name.replace(".", "_")
+        lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+
+    for histogram in _histograms:
+        lines += histogram.render()
+
+    return "\n".join(lines) + "\n"
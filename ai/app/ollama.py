@@ -1,19 +1,32 @@
-import httpx
+import logging
 from typing import AsyncGenerator
 
+import httpx
+
+from app import jsonutil
+from app.backends import RETRYABLE_ERRORS, chat_pool
+from app.clients import get_async_client
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
 
 async def chat_stream(
     messages: list[dict],
     model: str | None = None,
+    max_tokens: int | None = None,
 ) -> AsyncGenerator[str, None]:
     """
     Stream chat responses from Ollama API.
 
+    Closing the generator (e.g. on client disconnect) closes the HTTP
+    response, which makes Ollama stop generating. Connection failures
+    before the first token are retried on another backend.
+
     Args:
         messages: List of message dicts with 'role' and 'content'
         model: Optional model override, defaults to settings.ollama_model
+        max_tokens: Optional cap on generated tokens (Ollama `num_predict`)
 
     Yields:
         Text chunks from the LLM response
@@ -24,35 +37,61 @@ async def chat_stream(
         "model": model,
         "messages": messages,
         "stream": True,
+        "keep_alive": settings.ollama_keep_alive,
         "options": {
             "temperature": 0.1,  # Very low temperature for factual responses
             "top_p": 0.9,
-            "num_ctx": 32768,  # Large context window
+            "num_ctx": settings.ollama_num_ctx,
         },
     }
+    if max_tokens:
+        payload["options"]["num_predict"] = max_tokens
 
-    async with httpx.AsyncClient(timeout=300.0) as client:
-        async with client.stream(
-            "POST",
-            f"{settings.ollama_host}/api/chat",
-            json=payload,
-        ) as response:
-            response.raise_for_status()
+    # Encode the (context-heavy) prompt once, not once per attempt
+    body = jsonutil.dumps_bytes(payload)
+    client = get_async_client()
+    tried = set()
+
+    for attempt in range(chat_pool.attempts):
+        backend = chat_pool.choose(exclude=tried)
+        tried.add(backend.url)
+        started = False
+        ok = True
 
-            async for line in response.aiter_lines():
-                if line:
-                    import json
-                    data = json.loads(line)
-                    if "message" in data and "content" in data["message"]:
-                        yield data["message"]["content"]
+        try:
+            async with client.stream(
+                "POST",
+                f"{backend.url}/api/chat",
+                content=body,
+                headers={"Content-Type": "application/json"},
+            ) as response:
+                response.raise_for_status()
+
+                async for data in jsonutil.iter_ndjson(response.aiter_bytes()):
+                    content = data.get("message", {}).get("content")
+                    if content:
+                        started = True
+                        yield content
 
                     if data.get("done", False):
                         break
+            return
+        except RETRYABLE_ERRORS as e:
+            ok = False
+            if started or attempt == chat_pool.attempts - 1:
+                raise
+            logger.warning("%s failed before first token (%r), retrying on another backend", backend.url, e)
+        except httpx.HTTPStatusError as e:
+            ok = e.response.status_code < 500
+            raise
+        finally:
+            chat_pool.release(backend, ok=ok)
 
 
 async def chat_complete(
     messages: list[dict],
     model: str | None = None,
+    options: dict | None = None,
 ) -> str:
     """
     Get complete chat response from Ollama API (non-streaming).
@@ -60,6 +99,7 @@ async def chat_complete(
     Args:
         messages: List of message dicts with 'role' and 'content'
         model: Optional model override
+        options: Optional Ollama generation options
 
     Returns:
         Complete response text
@@ -70,13 +110,19 @@ async def chat_complete(
         "model": model,
         "messages": messages,
         "stream": False,
+        "keep_alive": settings.ollama_keep_alive,
     }
+    if options:
+        payload["options"] = options
 
-    async with httpx.AsyncClient(timeout=300.0) as client:
+    async def send(base_url: str) -> str:
+        client = get_async_client()
         response = await client.post(
-            f"{settings.ollama_host}/api/chat",
+            f"{base_url}/api/chat",
             json=payload,
         )
         response.raise_for_status()
         data = response.json()
-        return data["message"]["content"]
\ No newline at end of file
+        return data["message"]["content"]
+
+    return await chat_pool.request(send)
\ No newline at end of file
@@ -1,13 +1,28 @@
-from .loader import DocumentLoader
-from .chunker import TextChunker
-from .embeddings import EmbeddingGenerator
-from .vectorstore import VectorStore
-from .retriever import Retriever
-
-__all__ = [
-    "DocumentLoader",
-    "TextChunker",
-    "EmbeddingGenerator",
-    "VectorStore",
-    "Retriever",
-]
+"""
+RAG components.
+
+Names are imported on first access, so `from app.rag import Retriever`
+does not pull in the ingestion-only document loaders and text splitters.
+"""
+
+import importlib
+
+_EXPORTS = {
+    "DocumentLoader": ".loader",
+    "TextChunker": ".chunker",
+    "EmbeddingGenerator": ".embeddings",
+    "BaseVectorStore": ".vectorstore",
+    "VectorStore": ".vectorstore",
+    "create_vectorstore": ".vectorstore",
+    "Retriever": ".retriever",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,57 @@
+import unicodedata
+from array import array
+from typing import List, Optional
+
+from app.cachestore import CacheBackend, create_cache, make_key
+from app.config import settings
+
+# ----------------------------------------------------------------------
+
+
+def normalize_query(text: str) -> str:
+    """Normalize query text so trivially different questions share a key."""
+    text = unicodedata.normalize("NFKC", text)
+    return " ".join(text.casefold().split())
+
+
+class EmbeddingCache:
+    """Query embeddings stored as float32 bytes, bounded by entries, bytes and TTL."""
+
+    def __init__(
+        self,
+        max_entries: int = None,
+        max_bytes: int = None,
+        ttl: float = None,
+        backend: CacheBackend = None,
+    ):
+        self.backend = backend if backend is not None else create_cache(
+            "embedding",
+            max_entries=max_entries or settings.embedding_cache_max_entries,
+            max_bytes=max_bytes or settings.embedding_cache_max_bytes,
+            ttl=ttl if ttl is not None else settings.embedding_cache_ttl,
+        )
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """Return the cached embedding for a query, or None."""
+        value = self.backend.get(make_key(model, normalize_query(text)))
+        if value is None:
+            return None
+        vector = array("f")
+        vector.frombytes(value)
+        return vector.tolist()
+
+    def set(self, model: str, text: str, embedding: List[float]) -> None:
+        """Store an embedding, evicting least recently used entries as needed."""
+        self.backend.set(make_key(model, normalize_query(text)), array("f", embedding).tobytes())
+
+    def clear(self) -> None:
+        """Drop all cached embeddings."""
+        self.backend.clear()
+
+    def get_stats(self) -> dict:
+        """Get cache statistics."""
+        return self.backend.get_stats()
+
+
+# Shared by every embedding function in the process
+query_embedding_cache = EmbeddingCache()
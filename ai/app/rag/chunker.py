@@ -4,6 +4,7 @@ from langchain.schema import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from app.config import settings
+from .manifest import chunk_id
 
 # ----------------------------------------------------------------------
 
@@ -30,9 +31,19 @@ class TextChunker:
         """Split documents into chunks while preserving metadata."""
         chunks = self.splitter.split_documents(documents)
 
-        # Add chunk index to metadata
-        for i, chunk in enumerate(chunks):
-            chunk.metadata["chunk_index"] = i
+        # Add per-source chunk index and a content-derived chunk ID, so
+        # adding or editing one file does not shift the IDs of the others
+        next_index = {}
+        seen = {}
+        for chunk in chunks:
+            source = chunk.metadata.get("source", "unknown")
+            chunk.metadata["chunk_index"] = next_index.get(source, 0)
+            next_index[source] = chunk.metadata["chunk_index"] + 1
+
+            base_id = chunk_id(source, chunk.page_content)
+            occurrence = seen.get(base_id, 0)
+            seen[base_id] = occurrence + 1
+            chunk.metadata["chunk_id"] = chunk_id(source, chunk.page_content, occurrence)
 
         print(f"Split {len(documents)} documents into {len(chunks)} chunks")
         return chunks
@@ -0,0 +1,135 @@
+import logging
+import re
+from typing import List
+
+from app.config import settings
+
+# ----------------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+
+CYRILLIC_RE = re.compile(r"[\u0400-\u04FF]")
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count without a tokenizer.
+
+    Multilingual tokenizers split Cyrillic text much finer than English:
+    roughly 2.5 characters per token versus 4 for Latin text.
+    """
+    cyrillic = len(CYRILLIC_RE.findall(text))
+    return int(cyrillic / 2.5 + (len(text) - cyrillic) / 4) + 1
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = WORD_RE.findall(text.casefold())
+    return {tuple(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+
+
+def _merge_overlapping(first: str, second: str, max_overlap: int) -> str:
+    """Concatenate two consecutive chunks, dropping the text they share."""
+    limit = min(len(first), len(second), max_overlap)
+    for size in range(limit, 0, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return f"{first}\n{second}"
+
+
+class ContextBuilder:
+    """Assemble retrieved chunks into a prompt context within a token budget."""
+
+    def __init__(
+        self,
+        budget_tokens: int = None,
+        duplicate_threshold: float = None,
+    ):
+        self.budget_tokens = budget_tokens or int(settings.ollama_num_ctx * settings.context_budget_ratio)
+        self.duplicate_threshold = duplicate_threshold or settings.context_duplicate_threshold
+        # The chunker never overlaps more than chunk_overlap characters
+        self.max_overlap = settings.chunk_overlap + 1
+
+    def _merge_adjacent(self, results: List[dict]) -> List[dict]:
+        """Merge chunks that are neighbours in the same source, keeping rank order."""
+        passages: List[dict] = []
+        by_position = {}
+
+        for result in results:
+            metadata = result.get("metadata", {})
+            source = metadata.get("source", "Unknown")
+            index = metadata.get("chunk_index")
+
+            if index is not None:
+                # Extend an existing passage that ends right before or starts right after this chunk
+                before = by_position.pop((source, "end", index - 1), None)
+                after = by_position.pop((source, "start", index + 1), None)
+                if before is not None or after is not None:
+                    passage = before or after
+                    if before is not None and after is not None:
+                        # This chunk bridges two passages
+                        passage["content"] = _merge_overlapping(
+                            _merge_overlapping(before["content"], result["content"], self.max_overlap),
+                            after["content"], self.max_overlap,
+                        )
+                        passage["end"] = after["end"]
+                        passages = [p for p in passages if p is not after]
+                    elif before is not None:
+                        passage["content"] = _merge_overlapping(passage["content"], result["content"], self.max_overlap)
+                        passage["end"] = index
+                    else:
+                        passage["content"] = _merge_overlapping(result["content"], passage["content"], self.max_overlap)
+                        passage["start"] = index
+
+                    by_position[(source, "start", passage["start"])] = passage
+                    by_position[(source, "end", passage["end"])] = passage
+                    continue
+
+            passage = {"source": source, "content": result["content"], "start": index, "end": index}
+            passages.append(passage)
+            if index is not None:
+                by_position[(source, "start", index)] = passage
+                by_position[(source, "end", index)] = passage
+
+        return passages
+
+    def _drop_duplicates(self, passages: List[dict]) -> List[dict]:
+        """Drop passages that mostly repeat a higher-ranked one."""
+        kept, kept_shingles = [], []
+        for passage in passages:
+            shingles = _shingles(passage["content"])
+            duplicate = any(
+                len(shingles & other) / (len(shingles | other) or 1) >= self.duplicate_threshold
+                for other in kept_shingles
+            )
+            if not duplicate:
+                kept.append(passage)
+                kept_shingles.append(shingles)
+        return kept
+
+    def build(self, results: List[dict]) -> str:
+        """Build the context string, highest-ranked passages first."""
+        passages = self._drop_duplicates(self._merge_adjacent(results))
+
+        context_parts = []
+        used_tokens = 0
+        for i, passage in enumerate(passages, 1):
+            part = f"[Source {i}: {passage['source']}]\n{passage['content']}"
+            tokens = estimate_tokens(part)
+
+            if used_tokens + tokens > self.budget_tokens:
+                if not context_parts:
+                    # Always include something: truncate the best passage
+                    ratio = self.budget_tokens / tokens
+                    context_parts.append(part[:int(len(part) * ratio)])
+                    used_tokens = self.budget_tokens
+                break
+
+            context_parts.append(part)
+            used_tokens += tokens
+
+        logger.debug(
+            "Context: %d passages from %d chunks, ~%d tokens (budget %d)",
+            len(context_parts), len(results), used_tokens, self.budget_tokens,
+        )
+        return "\n\n---\n\n".join(context_parts)
@@ -1,11 +1,20 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
 import httpx
 
+from app.backends import BackendPool, embedding_pool
+from app.clients import get_async_client, get_sync_client
 from app.config import settings
+from app.singleflight import SingleFlight
+from .cache import EmbeddingCache, normalize_query, query_embedding_cache
 
 # ----------------------------------------------------------------------
 
+logger = logging.getLogger(__name__)
+
 
 class EmbeddingGenerator:
     """Generate embeddings using Ollama."""
@@ -14,66 +23,168 @@ class EmbeddingGenerator:
         self,
         model: str = None,
         base_url: str = None,
+        batch_size: int = None,
+        concurrency: int = None,
     ):
         self.model = model or settings.embedding_model
-        self.base_url = base_url or settings.ollama_host
+        # An explicit base_url pins this generator to one host
+        self.pool = BackendPool([base_url.rstrip("/")], name="embedding") if base_url else embedding_pool
+        self.batch_size = batch_size or settings.embedding_batch_size
+        self.concurrency = concurrency or settings.embedding_concurrency
+
+        # None until the first batch call tells us whether /api/embed exists
+        self._batch_supported = None if settings.embedding_batching else False
+
+    def _batches(self, texts: List[str]) -> List[List[str]]:
+        return [
+            texts[i:i + self.batch_size]
+            for i in range(0, len(texts), self.batch_size)
+        ]
+
+    def _batch_payload(self, texts: List[str]) -> dict:
+        return {
+            "model": self.model,
+            "input": texts,
+            "keep_alive": settings.ollama_keep_alive,
+        }
+
+    def _check_batch_response(self, response: httpx.Response) -> bool:
+        """Return False if the server has no /api/embed endpoint (older Ollama)."""
+        if response.status_code in (404, 405):
+            try:
+                # A JSON error body means the route exists (e.g. unknown model)
+                has_error_body = "error" in response.json()
+            except ValueError:
+                has_error_body = False
+
+            if not has_error_body:
+                logger.warning("/api/embed not available, falling back to /api/embeddings")
+                self._batch_supported = False
+                return False
+
+        response.raise_for_status()
+        self._batch_supported = True
+        return True
 
     async def embed_text(self, text: str) -> List[float]:
         """Generate embedding for a single text."""
-        async with httpx.AsyncClient() as client:
+        async def send(base_url: str) -> List[float]:
+            client = get_async_client()
             response = await client.post(
-                f"{self.base_url}/api/embeddings",
+                f"{base_url}/api/embeddings",
                 json={
                     "model": self.model,
                     "prompt": text,
+                    "keep_alive": settings.ollama_keep_alive,
                 },
-                timeout=60.0,
+                timeout=settings.embedding_timeout,
             )
             response.raise_for_status()
             return response.json()["embedding"]
 
+        return await self.pool.request(send)
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for a batch of texts in one request."""
+        async def send(base_url: str):
+            client = get_async_client()
+            response = await client.post(
+                f"{base_url}/api/embed",
+                json=self._batch_payload(texts),
+                timeout=settings.embedding_timeout,
+            )
+            if self._check_batch_response(response):
+                return response.json()["embeddings"]
+            return None
+
+        if self._batch_supported is not False:
+            embeddings = await self.pool.request(send)
+            if embeddings is not None:
+                return embeddings
+
+        return [await self.embed_text(text) for text in texts]
+
     async def embed_texts(self, texts: List[str]) -> List[List[float]]:
         """Generate embeddings for multiple texts."""
-        embeddings = []
-        for i, text in enumerate(texts):
-            if i % 10 == 0:
-                print(f"Embedding {i + 1}/{len(texts)}...")
-            embedding = await self.embed_text(text)
-            embeddings.append(embedding)
-        return embeddings
+        batches = self._batches(texts)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(i: int, batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                if len(batches) > 1:
+                    logger.debug("Embedding batch %d/%d", i + 1, len(batches))
+                return await self.embed_batch(batch)
+
+        results = await asyncio.gather(*(run(i, b) for i, b in enumerate(batches)))
+        return [embedding for batch in results for embedding in batch]
 
     def embed_text_sync(self, text: str) -> List[float]:
         """Synchronous version for embedding a single text."""
-        with httpx.Client() as client:
+        def send(base_url: str) -> List[float]:
+            client = get_sync_client()
             response = client.post(
-                f"{self.base_url}/api/embeddings",
+                f"{base_url}/api/embeddings",
                 json={
                     "model": self.model,
                     "prompt": text,
+                    "keep_alive": settings.ollama_keep_alive,
                 },
-                timeout=60.0,
+                timeout=settings.embedding_timeout,
             )
             response.raise_for_status()
             return response.json()["embedding"]
 
+        return self.pool.request_sync(send)
+
+    def embed_batch_sync(self, texts: List[str]) -> List[List[float]]:
+        """Synchronous version for embedding a batch of texts."""
+        def send(base_url: str):
+            client = get_sync_client()
+            response = client.post(
+                f"{base_url}/api/embed",
+                json=self._batch_payload(texts),
+                timeout=settings.embedding_timeout,
+            )
+            if self._check_batch_response(response):
+                return response.json()["embeddings"]
+            return None
+
+        if self._batch_supported is not False:
+            embeddings = self.pool.request_sync(send)
+            if embeddings is not None:
+                return embeddings
+
+        return [self.embed_text_sync(text) for text in texts]
+
     def embed_texts_sync(self, texts: List[str]) -> List[List[float]]:
         """Synchronous version for embedding multiple texts."""
-        embeddings = []
-        for i, text in enumerate(texts):
-            if i % 10 == 0:
-                print(f"Embedding {i + 1}/{len(texts)}...")
-            embedding = self.embed_text_sync(text)
-            embeddings.append(embedding)
-        return embeddings
+        batches = self._batches(texts)
+        if len(batches) <= 1 or self.concurrency <= 1:
+            results = [self.embed_batch_sync(batch) for batch in batches]
+        else:
+            logger.debug("Embedding %d texts in %d batches", len(texts), len(batches))
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                results = list(pool.map(self.embed_batch_sync, batches))
+        return [embedding for batch in results for embedding in batch]
 
 
 class OllamaEmbeddingFunction:
     """ChromaDB-compatible embedding function using Ollama."""
 
-    def __init__(self, model: str = None, base_url: str = None):
+    def __init__(
+        self,
+        model: str = None,
+        base_url: str = None,
+        cache: EmbeddingCache = None,
+    ):
         self._model = model or settings.embedding_model
         self.generator = EmbeddingGenerator(model=self._model, base_url=base_url)
 
+        if cache is None and settings.embedding_cache_enabled:
+            cache = query_embedding_cache
+        self.cache = cache
+        self._flights = SingleFlight("embed") if settings.singleflight_enabled else None
+
     def __call__(self, input: List[str]) -> List[List[float]]:
         """Generate embeddings for a list of texts (ChromaDB interface)."""
         return self.generator.embed_texts_sync(input)
@@ -82,13 +193,55 @@ class OllamaEmbeddingFunction:
         """Embed documents (ChromaDB interface)."""
         return self.generator.embed_texts_sync(documents)
 
+    def _cached(self, queries: List[str]) -> tuple[list, List[int]]:
+        """Look up queries in the cache; return embeddings and indices of misses."""
+        if self.cache is None:
+            return [None] * len(queries), list(range(len(queries)))
+
+        embeddings = [self.cache.get(self._model, q) for q in queries]
+        missing = [i for i, e in enumerate(embeddings) if e is None]
+        return embeddings, missing
+
+    def _store(self, queries: List[str], embeddings: list, missing: List[int], computed: list) -> None:
+        for i, embedding in zip(missing, computed):
+            embeddings[i] = embedding
+            if self.cache is not None:
+                self.cache.set(self._model, queries[i], embedding)
+
     def embed_query(self, input) -> List[List[float]]:
         """Embed a single query (ChromaDB interface)."""
         # ChromaDB may pass a list with single item or a string
-        if isinstance(input, list):
-            return self.generator.embed_texts_sync(input)
-        else:
-            return [self.generator.embed_text_sync(input)]
+        queries = input if isinstance(input, list) else [input]
+
+        embeddings, missing = self._cached(queries)
+        if missing:
+            texts = [queries[i] for i in missing]
+            if len(texts) == 1:
+                computed = [self.generator.embed_text_sync(texts[0])]
+            else:
+                computed = self.generator.embed_texts_sync(texts)
+            self._store(queries, embeddings, missing, computed)
+
+        return embeddings
+
+    async def embed_query_async(self, input) -> List[List[float]]:
+        """Embed a query without blocking the event loop."""
+        queries = input if isinstance(input, list) else [input]
+
+        embeddings, missing = self._cached(queries)
+        if missing:
+            texts = [queries[i] for i in missing]
+            if len(texts) == 1 and self._flights is not None:
+                # Identical questions arriving together share one embedding call
+                key = (self._model, normalize_query(texts[0]))
+                computed = [await self._flights.do(key, lambda: self.generator.embed_text(texts[0]))]
+            elif len(texts) == 1:
+                computed = [await self.generator.embed_text(texts[0])]
+            else:
+                computed = await self.generator.embed_texts(texts)
+            self._store(queries, embeddings, missing, computed)
+
+        return embeddings
 
     def name(self) -> str:
         """Return the name of the embedding function (required by ChromaDB)."""
@@ -0,0 +1,185 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from app.config import settings
+
+# ----------------------------------------------------------------------
+
+# Keep emails, domains and dashed form names together as single tokens
+TOKEN_RE = re.compile(r"[\w@.\-]+", re.UNICODE)
+SPLIT_RE = re.compile(r"[@.\-_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, plus the parts of compound tokens."""
+    tokens = []
+    for raw in TOKEN_RE.findall(text.casefold()):
+        raw = raw.strip(".-_")
+        if not raw:
+            continue
+        tokens.append(raw)
+
+        parts = [p for p in SPLIT_RE.split(raw) if p]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def reciprocal_rank_fusion(result_lists: Iterable[List[dict]], k: int = None) -> List[dict]:
+    """Merge ranked result lists by reciprocal rank, keyed on result id."""
+    k = k or settings.rrf_k
+
+    fused: Dict[str, dict] = {}
+    scores: Dict[str, float] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, 1):
+            doc_id = result["id"]
+            fused.setdefault(doc_id, result)
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+
+    ordered = sorted(fused, key=lambda doc_id: scores[doc_id], reverse=True)
+    return [{**fused[doc_id], "rrf_score": scores[doc_id]} for doc_id in ordered]
+
+
+class BM25Index:
+    """In-memory BM25 inverted index over chunks, persisted as JSON."""
+
+    def __init__(self, path: str = None, k1: float = 1.5, b: float = 0.75):
+        self.path = Path(path or settings.bm25_index_path)
+        self.k1 = k1
+        self.b = b
+
+        self.docs: Dict[str, tuple] = {}  # id -> (content, metadata, length)
+        self.postings: Dict[str, Dict[str, int]] = {}  # term -> {id: term frequency}
+        self.total_length = 0
+        self.mtime: Optional[float] = None
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def load(cls, path: str = None) -> "BM25Index":
+        """Load an index from disk (empty if it does not exist)."""
+        index = cls(path)
+        try:
+            index.mtime = index.path.stat().st_mtime
+            data = json.loads(index.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return index
+
+        # Only documents are stored; postings are rebuilt on load
+        for doc_id, (content, metadata) in data["docs"].items():
+            index.add(doc_id, content, metadata)
+        return index
+
+    def save(self) -> None:
+        """Write the index atomically."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps(
+                {"docs": {doc_id: [content, metadata] for doc_id, (content, metadata, _) in self.docs.items()}},
+                ensure_ascii=False,
+            ),
+            encoding="utf-8",
+        )
+        os.replace(tmp_path, self.path)
+        self.mtime = self.path.stat().st_mtime
+
+    def is_stale(self) -> bool:
+        """True if the file on disk changed since this index was loaded."""
+        try:
+            return self.path.stat().st_mtime != self.mtime
+        except FileNotFoundError:
+            return self.mtime is not None
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+
+    def add(self, doc_id: str, content: str, metadata: dict = None) -> None:
+        """Add or replace a chunk."""
+        if doc_id in self.docs:
+            self.remove(doc_id)
+
+        terms = Counter(tokenize(content))
+        length = sum(terms.values())
+        self.docs[doc_id] = (content, metadata or {}, length)
+        self.total_length += length
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+
+    def add_documents(self, documents: list) -> None:
+        """Add chunks carrying a `chunk_id` in their metadata."""
+        for doc in documents:
+            self.add(doc.metadata["chunk_id"], doc.page_content, doc.metadata)
+
+    def remove(self, doc_id: str) -> None:
+        entry = self.docs.pop(doc_id, None)
+        if entry is None:
+            return
+
+        content, _, length = entry
+        self.total_length -= length
+        for term in set(tokenize(content)):
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+
+    def remove_ids(self, ids: Iterable[str]) -> None:
+        for doc_id in ids:
+            self.remove(doc_id)
+
+    def clear(self) -> None:
+        self.docs.clear()
+        self.postings.clear()
+        self.total_length = 0
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def search(self, query: str, top_k: int = None) -> List[dict]:
+        """Return the top_k chunks by BM25 score."""
+        top_k = top_k or settings.top_k_results
+        if not self.docs:
+            return []
+
+        n_docs = len(self.docs)
+        avg_length = self.total_length / n_docs or 1.0
+        scores: Dict[str, float] = {}
+
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+
+            idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, tf in posting.items():
+                length = self.docs[doc_id][2]
+                norm = tf + self.k1 * (1 - self.b + self.b * length / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+        ranked = sorted(scores, key=scores.get, reverse=True)[:top_k]
+        return [
+            {
+                "id": doc_id,
+                "content": self.docs[doc_id][0],
+                "metadata": self.docs[doc_id][1],
+                "distance": None,
+                "score": None,
+                "bm25_score": scores[doc_id],
+            }
+            for doc_id in ranked
+        ]
+
+    def __len__(self) -> int:
+        return len(self.docs)
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+
+# ----------------------------------------------------------------------
+
+
+def file_hash(file_path: Path) -> str:
+    """SHA-256 of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(source: str, content: str, occurrence: int = 0) -> str:
+    """Stable chunk ID derived from the source name and the chunk content."""
+    digest = hashlib.sha1(content.encode("utf-8")).hexdigest()[:16]
+    if occurrence:
+        digest = f"{digest}-{occurrence}"
+    return f"{source}_{digest}"
+
+
+class IngestManifest:
+    """Per-file content hashes and chunk IDs from the last ingestion."""
+
+    def __init__(self, path: str = None):
+        self.path = Path(path or settings.ingest_manifest_path)
+        self.files: Dict[str, dict] = {}
+
+    @classmethod
+    def load(cls, path: str = None) -> "IngestManifest":
+        manifest = cls(path)
+        if manifest.path.exists():
+            data = json.loads(manifest.path.read_text(encoding="utf-8"))
+            manifest.files = data.get("files", {})
+        return manifest
+
+    def save(self) -> None:
+        """Write the manifest atomically."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps({"files": self.files}, ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        self.files = {}
+
+    def file_hash(self, source: str) -> Optional[str]:
+        entry = self.files.get(source)
+        return entry["hash"] if entry else None
+
+    def chunk_ids(self, source: str) -> List[str]:
+        entry = self.files.get(source)
+        return list(entry["chunks"]) if entry else []
+
+    def set_file(self, source: str, hash: str, chunk_ids: List[str]) -> None:
+        self.files[source] = {"hash": hash, "chunks": chunk_ids}
+
+    def remove_file(self, source: str) -> List[str]:
+        """Forget a file and return the chunk IDs it owned."""
+        entry = self.files.pop(source, None)
+        return list(entry["chunks"]) if entry else []
+
+    def apply(self, source: str, hash: str, chunks: list) -> Tuple[list, list, List[str]]:
+        """
+        Record a file's new chunks and diff them against the previous run.
+
+        Returns:
+            (chunks to embed, unchanged chunks, stale chunk IDs to delete)
+        """
+        old_ids = set(self.chunk_ids(source))
+        new_ids = [chunk.metadata["chunk_id"] for chunk in chunks]
+
+        to_embed = [c for c in chunks if c.metadata["chunk_id"] not in old_ids]
+        unchanged = [c for c in chunks if c.metadata["chunk_id"] in old_ids]
+        stale_ids = sorted(old_ids - set(new_ids))
+
+        self.set_file(source, hash, new_ids)
+        return to_embed, unchanged, stale_ids
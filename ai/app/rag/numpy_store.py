@@ -0,0 +1,438 @@
+"""
+In-process vector store with exact search over a memory-mapped matrix.
+
+For corpora of a few thousand chunks, scoring every chunk with one matrix
+product is faster than a round trip through ChromaDB's SQLite and HNSW
+layers, and the results are exact. Embeddings are L2-normalized and kept
+in `vectors.npy` (float32, float16 or per-row scaled int8), opened with
+`mmap_mode="r"`; ids, documents and metadata are a parallel JSON array.
+
+    <numpy_persist_dir>/<collection>/vectors.npy
+                                    /scales.npy   (int8 only)
+                                    /meta.json
+
+Changes are kept in memory and written when the collection is marked
+updated. Readers in other processes (the API server) reload when
+`meta.json` changes.
+"""
+
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app import jsonutil
+from app.config import settings
+from .embeddings import OllamaEmbeddingFunction
+from .vectorstore import BaseVectorStore
+
+if TYPE_CHECKING:
+    from langchain.schema import Document
+
+# ----------------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+
+DTYPES = ("float32", "float16", "int8")
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _save_array(path: Path, array: np.ndarray) -> None:
+    """Write a .npy file atomically."""
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+class NumpyVectorStore(BaseVectorStore):
+    """Exact cosine search over normalized embeddings held in NumPy."""
+
+    def __init__(
+        self,
+        persist_dir: str = None,
+        collection_name: str = None,
+        dtype: str = None,
+        block_size: int = None,
+    ):
+        self.persist_dir = persist_dir or settings.numpy_persist_dir
+        self.collection_name = collection_name or settings.chroma_collection_name
+        self.dtype = dtype or settings.numpy_dtype
+        self.block_size = settings.numpy_block_size if block_size is None else block_size
+        if self.dtype not in DTYPES:
+            raise ValueError(f"Unsupported numpy_dtype: {self.dtype} (expected one of {', '.join(DTYPES)})")
+
+        self.path = Path(self.persist_dir) / self.collection_name
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self.embedding_function = OllamaEmbeddingFunction()
+
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._mtime: Optional[float] = None
+        self._clear()
+        self._load()
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    @property
+    def _meta_file(self) -> Path:
+        return self.path / "meta.json"
+
+    def _clear(self) -> None:
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+        self._metadatas: List[dict] = []
+        self._rows: dict = {}  # id -> row
+        self._vectors: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+
+    def _load(self) -> None:
+        """Load the index from disk, memory-mapping the vectors."""
+        for attempt in range(3):
+            try:
+                mtime = self._meta_file.stat().st_mtime
+                meta = jsonutil.loads(self._meta_file.read_bytes())
+            except FileNotFoundError:
+                self._clear()
+                self._mtime = None
+                return
+
+            vectors = np.load(self.path / "vectors.npy", mmap_mode="r")
+            scales = np.load(self.path / "scales.npy", mmap_mode="r") if meta["dtype"] == "int8" else None
+
+            # A writer replaces vectors before meta; retry if we caught it in between
+            if vectors.shape[0] != len(meta["ids"]) or str(vectors.dtype) != meta["dtype"]:
+                time.sleep(0.05 * (attempt + 1))
+                continue
+
+            # An existing index keeps its dtype until it is rebuilt
+            self.dtype = meta["dtype"]
+            self._ids = meta["ids"]
+            self._documents = meta["documents"]
+            self._metadatas = meta["metadatas"]
+            self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+            self._vectors = vectors
+            self._scales = scales
+            self._mtime = mtime
+            self._dirty = False
+            return
+
+        raise RuntimeError(f"Vector index at {self.path} is inconsistent")
+
+    def _reload_if_stale(self) -> None:
+        if self._dirty:
+            return
+        try:
+            mtime = self._meta_file.stat().st_mtime
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._mtime:
+            self._load()
+
+    def flush(self) -> None:
+        """Write pending changes to disk."""
+        with self._lock:
+            if not self._dirty:
+                return
+
+            if self._vectors is None or not self._ids:
+                for name in ("vectors.npy", "scales.npy", "meta.json"):
+                    (self.path / name).unlink(missing_ok=True)
+            else:
+                _save_array(self.path / "vectors.npy", self._vectors)
+                if self._scales is not None:
+                    _save_array(self.path / "scales.npy", self._scales)
+
+                tmp_path = self._meta_file.with_suffix(".tmp")
+                tmp_path.write_bytes(jsonutil.dumps_bytes({
+                    "dtype": self.dtype,
+                    "ids": self._ids,
+                    "documents": self._documents,
+                    "metadatas": self._metadatas,
+                }))
+                os.replace(tmp_path, self._meta_file)
+
+            self._dirty = False
+            self._load()  # Re-open as a memory map, releasing the in-memory copy
+
+    # ------------------------------------------------------------------
+    # Quantization
+    # ------------------------------------------------------------------
+
+    def _encode(self, normalized: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Convert normalized float32 rows to the storage dtype."""
+        if self.dtype == "int8":
+            scales = np.abs(normalized).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            quantized = np.round(normalized / scales[:, None]).astype(np.int8)
+            return quantized, scales.astype(np.float32)
+        return normalized.astype(self.dtype), None
+
+    @staticmethod
+    def _decode(vectors: np.ndarray, scales: Optional[np.ndarray], start: int, end: int) -> np.ndarray:
+        """Rows [start, end) as float32."""
+        block = np.asarray(vectors[start:end], dtype=np.float32)
+        if scales is not None:
+            block = block * np.asarray(scales[start:end])[:, None]
+        return block
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+
+    def _writable(self) -> None:
+        """Switch from the read-only memory map to an in-memory copy."""
+        if isinstance(self._vectors, np.memmap):
+            self._vectors = np.array(self._vectors)
+            if self._scales is not None:
+                self._scales = np.array(self._scales)
+        self._dirty = True
+
+    def add_documents(self, documents: List["Document"]) -> None:
+        """Embed documents and add them to the index."""
+        if not documents:
+            logger.info("No documents to add")
+            return
+
+        batch_size = settings.embedding_batch_size * settings.embedding_concurrency
+        for i in range(0, len(documents), batch_size):
+            batch = documents[i:i + batch_size]
+            logger.info("Adding batch %d/%d", i // batch_size + 1, (len(documents) - 1) // batch_size + 1)
+            embeddings = self.embedding_function.embed_documents([doc.page_content for doc in batch])
+            self.add_embedded(batch, embeddings)
+
+        self.mark_updated()
+        logger.info("Added %d documents to collection '%s'", len(documents), self.collection_name)
+
+    def add_embedded(self, documents: List["Document"], embeddings: List[List[float]]) -> None:
+        """Upsert chunks whose embeddings were computed by the caller."""
+        if not documents:
+            return
+
+        normalized = _normalize(embeddings)
+
+        with self._lock:
+            self._reload_if_stale()
+            self._writable()
+            vectors, scales = self._encode(normalized)
+
+            new_rows = []
+            for i, doc in enumerate(documents):
+                doc_id = doc.metadata["chunk_id"]
+                row = self._rows.get(doc_id)
+                if row is None:
+                    new_rows.append(i)
+                    continue
+                self._documents[row] = doc.page_content
+                self._metadatas[row] = dict(doc.metadata)
+                self._vectors[row] = vectors[i]
+                if scales is not None:
+                    self._scales[row] = scales[i]
+
+            if not new_rows:
+                return
+
+            for i in new_rows:
+                doc = documents[i]
+                self._rows[doc.metadata["chunk_id"]] = len(self._ids)
+                self._ids.append(doc.metadata["chunk_id"])
+                self._documents.append(doc.page_content)
+                self._metadatas.append(dict(doc.metadata))
+
+            added = vectors[new_rows]
+            self._vectors = added if self._vectors is None else np.concatenate([self._vectors, added])
+            if scales is not None:
+                added_scales = scales[new_rows]
+                self._scales = added_scales if self._scales is None else np.concatenate([self._scales, added_scales])
+
+    def update_metadata(self, documents: List["Document"]) -> None:
+        """Refresh metadata of already indexed chunks without re-embedding."""
+        if not documents:
+            return
+
+        with self._lock:
+            self._reload_if_stale()
+            self._writable()
+            for doc in documents:
+                row = self._rows.get(doc.metadata["chunk_id"])
+                if row is not None:
+                    self._metadatas[row] = dict(doc.metadata)
+
+    def delete_ids(self, ids: List[str]) -> None:
+        """Delete chunks by ID."""
+        if not ids:
+            return
+
+        with self._lock:
+            self._reload_if_stale()
+            drop = {self._rows[doc_id] for doc_id in ids if doc_id in self._rows}
+            if drop:
+                self._writable()
+                keep = np.array([row for row in range(len(self._ids)) if row not in drop], dtype=np.int64)
+                self._ids = [self._ids[row] for row in keep]
+                self._documents = [self._documents[row] for row in keep]
+                self._metadatas = [self._metadatas[row] for row in keep]
+                self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+                self._vectors = self._vectors[keep]
+                if self._scales is not None:
+                    self._scales = self._scales[keep]
+
+        logger.info("Deleted %d chunks from collection '%s'", len(ids), self.collection_name)
+
+    def delete_collection(self) -> None:
+        """Delete the entire collection."""
+        with self._lock:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._clear()
+            self._dirty = False
+            self._mtime = None
+        super().mark_updated()
+        logger.info("Deleted collection '%s'", self.collection_name)
+
+    def destroy(self) -> None:
+        """Delete the collection for good, including its directory."""
+        super().destroy()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def mark_updated(self) -> None:
+        """Persist pending changes and bump the index version."""
+        self.flush()
+        super().mark_updated()
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def _top_k(
+        self,
+        queries: np.ndarray,
+        vectors: np.ndarray,
+        scales: Optional[np.ndarray],
+        k: int,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Exact top-k rows for each query, scoring `block_size` rows at a time.
+
+        Returns:
+            (rows, scores), each of shape (len(queries), k), best first
+        """
+        n = len(vectors)
+        block_size = self.block_size or n
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+
+        for start in range(0, n, block_size):
+            end = min(n, start + block_size)
+            scores = queries @ self._decode(vectors, scales, start, end).T  # (queries, rows)
+            # Quantized rows are not exactly unit length; keep scores valid cosines
+            np.clip(scores, -1.0, 1.0, out=scores)
+
+            if k < end - start:
+                rows = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, rows, axis=1)
+            else:
+                rows = np.broadcast_to(np.arange(end - start), scores.shape)
+
+            best_rows = np.concatenate([best_rows, rows + start], axis=1)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            if best_rows.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def query_embeddings(self, embeddings: List[List[float]], top_k: int = None) -> List[List[dict]]:
+        """Nearest chunks for each query embedding (blocking)."""
+        top_k = top_k or settings.top_k_results
+
+        # Take a consistent snapshot; updates replace these objects rather
+        # than mutating them in a server process, so scoring runs unlocked
+        with self._lock:
+            self._reload_if_stale()
+            ids, documents, metadatas = self._ids, self._documents, self._metadatas
+            vectors, scales = self._vectors, self._scales
+
+        if not ids:
+            return [[] for _ in embeddings]
+
+        rows, scores = self._top_k(_normalize(embeddings), vectors, scales, min(top_k, len(ids)))
+        return [
+            [
+                {
+                    "id": ids[row],
+                    "content": documents[row],
+                    "metadata": metadatas[row],
+                    "distance": 1 - float(score),
+                    "score": float(score),
+                }
+                for row, score in zip(query_rows, query_scores)
+            ]
+            for query_rows, query_scores in zip(rows.tolist(), scores.tolist())
+        ]
+
+    # ------------------------------------------------------------------
+    # Inspection
+    # ------------------------------------------------------------------
+
+    def count(self) -> int:
+        """Number of indexed chunks."""
+        with self._lock:
+            self._reload_if_stale()
+            return len(self._ids)
+
+    def get_stats(self) -> dict:
+        """Get collection statistics."""
+        with self._lock:
+            self._reload_if_stale()
+            vector_bytes = self._vectors.nbytes if self._vectors is not None else 0
+            return {
+                "backend": "numpy",
+                "collection_name": self.collection_name,
+                "document_count": len(self._ids),
+                "persist_dir": self.persist_dir,
+                "dtype": self.dtype,
+                "dimensions": self._vectors.shape[1] if self._vectors is not None else None,
+                "vector_bytes": vector_bytes,
+            }
+
+    def get_documents(self) -> List[tuple]:
+        """Return (id, content, metadata) for every chunk in the collection."""
+        with self._lock:
+            self._reload_if_stale()
+            return list(zip(self._ids, self._documents, self._metadatas))
+
+    def iter_embedded(self, batch_size: int = 1000) -> Iterator[Tuple[List["Document"], List[List[float]]]]:
+        """Yield batches of stored chunks together with their (normalized) embeddings."""
+        from langchain.schema import Document
+
+        with self._lock:
+            self._reload_if_stale()
+            ids, documents, metadatas = self._ids, self._documents, self._metadatas
+            vectors, scales = self._vectors, self._scales
+
+        for start in range(0, len(ids), batch_size):
+            end = min(start + batch_size, len(ids))
+            batch = [
+                Document(page_content=documents[row], metadata={**metadatas[row], "chunk_id": ids[row]})
+                for row in range(start, end)
+            ]
+            yield batch, self._decode(vectors, scales, start, end).tolist()
@@ -0,0 +1,243 @@
+"""
+Streaming ingestion pipeline.
+
+    files ──► process pool (load + chunk) ──► bounded queue ──► embed workers ──► Chroma upsert
+                                        └──► BM25 index
+
+Files are parsed in worker processes and their chunks stream through a
+bounded queue into batched embedding threads, which upsert into Chroma as
+batches complete. Only a bounded number of files and chunks are held in
+memory at any time, regardless of corpus size. Metadata refreshes for
+unchanged chunks are applied in batches of `UPDATE_BATCH_SIZE` as files
+complete; stale chunk IDs are collected and deleted in one pass at the
+end, so the index is rewritten once per run.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Tuple
+
+from app.config import settings
+from .chunker import TextChunker
+from .lexical import BM25Index
+from .loader import DocumentLoader
+from .manifest import IngestManifest
+from .vectorstore import BaseVectorStore
+
+# ----------------------------------------------------------------------
+
+_DONE = object()
+
+# Unchanged chunks held before their metadata refresh is applied
+UPDATE_BATCH_SIZE = 500
+
+
+def _parse_file(file_path: str) -> Tuple[list, float]:
+    """Load and chunk one file (runs in a worker process)."""
+    started = time.perf_counter()
+    documents = DocumentLoader().load_file(Path(file_path))
+    chunks = TextChunker().split_documents(documents)
+    return chunks, time.perf_counter() - started
+
+
+@dataclass
+class StageStats:
+    """Items processed and busy time for one pipeline stage."""
+
+    name: str
+    items: int = 0
+    seconds: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, items: int, seconds: float) -> None:
+        with self.lock:
+            self.items += items
+            self.seconds += seconds
+
+    def summary(self, unit: str) -> str:
+        rate = self.items / self.seconds if self.seconds else 0.0
+        return f"{self.name:<8} {self.items:>7} {unit:<7} {self.seconds:8.2f}s busy  {rate:9.1f} {unit}/s"
+
+
+class IngestPipeline:
+    """Parse, chunk, embed and upsert changed files concurrently."""
+
+    def __init__(
+        self,
+        vectorstore: BaseVectorStore,
+        manifest: IngestManifest,
+        lexical: BM25Index,
+        parse_workers: int = None,
+        embed_workers: int = None,
+        queue_size: int = None,
+        batch_size: int = None,
+    ):
+        self.vectorstore = vectorstore
+        self.manifest = manifest
+        self.lexical = lexical
+        self.parse_workers = parse_workers or settings.ingest_parse_workers
+        self.embed_workers = embed_workers or settings.embedding_concurrency
+        self.queue_size = queue_size or settings.ingest_queue_size
+        self.batch_size = batch_size or settings.embedding_batch_size
+
+        self.generator = vectorstore.embedding_function.generator
+        self._queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        self._store_lock = threading.Lock()
+        self._errors: List[BaseException] = []
+
+        # Metadata refreshes are applied in batches, deletions once after the last file
+        self._to_update: list = []
+        self._stale_ids: List[str] = []
+
+        self.parse_stats = StageStats("parse")
+        self.embed_stats = StageStats("embed")
+        self.upsert_stats = StageStats("upsert")
+        self.files_done = 0
+        self.elapsed = 0.0
+
+    # ------------------------------------------------------------------
+    # Embedding workers
+    # ------------------------------------------------------------------
+
+    def _next_batch(self) -> Tuple[list, bool]:
+        """Block for one chunk, then take whatever else is ready up to a batch."""
+        item = self._queue.get()
+        if item is _DONE:
+            return [], True
+
+        batch = [item]
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _DONE:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _embed_worker(self) -> None:
+        finished = False
+        while not finished:
+            batch, finished = self._next_batch()
+            if not batch or self._errors:
+                continue
+
+            try:
+                started = time.perf_counter()
+                embeddings = self.generator.embed_batch_sync([c.page_content for c in batch])
+                self.embed_stats.record(len(batch), time.perf_counter() - started)
+
+                started = time.perf_counter()
+                with self._store_lock:
+                    self.vectorstore.add_embedded(batch, embeddings)
+                self.upsert_stats.record(len(batch), time.perf_counter() - started)
+            except Exception as e:
+                print(f"[Pipeline] Embedding batch failed: {e}")
+                self._errors.append(e)
+
+    # ------------------------------------------------------------------
+    # Coordinator
+    # ------------------------------------------------------------------
+
+    def _handle_parsed(self, source: str, file_hash: str, chunks: list) -> None:
+        if not chunks:
+            print(f"  {source}: no content, keeping previously indexed chunks")
+            return
+
+        to_embed, unchanged, stale_ids = self.manifest.apply(source, file_hash, chunks)
+        print(f"  {source}: {len(to_embed)} to embed, {len(unchanged)} unchanged, {len(stale_ids)} stale")
+
+        self._to_update.extend(unchanged)
+        if len(self._to_update) >= UPDATE_BATCH_SIZE:
+            self._flush_updates()
+        self._stale_ids.extend(stale_ids)
+        self.lexical.remove_ids(stale_ids)
+        self.lexical.add_documents(chunks)
+
+        # Blocks when the embedders fall behind, which keeps memory flat
+        for chunk in to_embed:
+            self._queue.put(chunk)
+
+    def _flush_updates(self) -> None:
+        """Apply the pending metadata refreshes (the store persists them on mark_updated)."""
+        with self._store_lock:
+            self.vectorstore.update_metadata(self._to_update)
+        self._to_update = []
+
+    def run(self, changed: List[Tuple[str, Path, str]]) -> bool:
+        """
+        Process (source, path, hash) tuples for new or changed files.
+
+        Returns:
+            True if every file was indexed without errors
+        """
+        started = time.perf_counter()
+
+        embedders = [
+            threading.Thread(target=self._embed_worker, name=f"embed-{i}", daemon=True)
+            for i in range(self.embed_workers)
+        ]
+        for thread in embedders:
+            thread.start()
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.parse_workers) as pool:
+                pending = {}
+                jobs = iter(changed)
+
+                # Keep at most two files per worker in flight
+                while True:
+                    while len(pending) < self.parse_workers * 2:
+                        job = next(jobs, None)
+                        if job is None:
+                            break
+                        source, file_path, file_hash = job
+                        pending[pool.submit(_parse_file, str(file_path))] = (source, file_hash)
+
+                    if not pending or self._errors:
+                        break
+
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        source, file_hash = pending.pop(future)
+                        try:
+                            chunks, seconds = future.result()
+                        except Exception as e:
+                            print(f"[Pipeline] Failed to parse {source}: {e}")
+                            self._errors.append(e)
+                            continue
+
+                        self.parse_stats.record(len(chunks), seconds)
+                        self.files_done += 1
+                        self._handle_parsed(source, file_hash, chunks)
+        finally:
+            for _ in embedders:
+                self._queue.put(_DONE)
+            for thread in embedders:
+                thread.join()
+
+        # Chunk IDs include the source, so a stale ID never names a chunk
+        # another file just upserted
+        self._flush_updates()
+        self.vectorstore.delete_ids(self._stale_ids)
+        self.vectorstore.mark_updated()
+        self.elapsed = time.perf_counter() - started
+        return not self._errors
+
+    def report(self) -> str:
+        """Per-stage throughput summary."""
+        wall = self.elapsed
+        lines = [
+            f"Files parsed: {self.files_done} in {wall:.2f}s wall",
+            self.parse_stats.summary("chunks"),
+            self.embed_stats.summary("chunks"),
+            self.upsert_stats.summary("chunks"),
+        ]
+        if wall:
+            lines.append(f"{'overall':<8} {self.upsert_stats.items / wall:.1f} chunks/s end to end")
+        return "\n".join(lines)
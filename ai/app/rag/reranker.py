@@ -0,0 +1,243 @@
+"""
+Second-stage reranking of retrieved chunks.
+
+The retriever fetches a wider candidate pool (`rerank_candidates`), a
+reranker scores each (query, chunk) pair, and only the best
+`rerank_top_k` chunks go into the prompt. Two scorers are available:
+
+    cross-encoder   sentence-transformers CrossEncoder on CPU (optional dependency)
+    ollama          the chat model rates passages 0-10 in batched prompts
+
+Scores are cached per (query, chunk id). If scoring does not finish
+within `rerank_budget_ms`, the candidates are returned in retrieval
+order; the scoring keeps running in the background and fills the cache,
+until it is cancelled `rerank_grace_ms` later.
+
+Scoring never competes with answers: the Ollama scorer takes LLM slots at
+background priority, at most `rerank_max_concurrent` at a time, and the
+cross-encoder runs on a thread of its own rather than the vector store
+executor.
+"""
+
+import asyncio
+import importlib.util
+import logging
+import re
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from app import metrics
+from app.cachestore import CacheBackend, create_cache, make_key
+from app.config import settings
+from app.ollama import chat_complete
+from app.scheduler import PRIORITY_BACKGROUND, llm_scheduler
+from .cache import normalize_query
+
+# ----------------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+
+OLLAMA_RERANK_PROMPT = """Оцени доколко всеки пасаж отговаря на въпроса, с число от 0 (не е свързан) до 10 (отговаря пряко).
+Отговори само с редове във формат "номер: оценка", по един за всеки пасаж.
+
+ВЪПРОС: {query}
+
+{passages}"""
+
+_SCORE_LINE = re.compile(r"^\s*\[?(\d+)\]?\s*[:.)-]\s*(\d+(?:\.\d+)?)", re.MULTILINE)
+
+
+_SCORE = struct.Struct("<f")
+
+
+class ScoreCache:
+    """Rerank scores keyed by (model, query, chunk id), four bytes each."""
+
+    def __init__(self, max_entries: int = None, backend: CacheBackend = None):
+        self.backend = backend if backend is not None else create_cache(
+            "rerank", max_entries=max_entries or settings.rerank_cache_size,
+        )
+
+    def get(self, model: str, query: str, chunk_id: str) -> Optional[float]:
+        value = self.backend.get(make_key(model, normalize_query(query), chunk_id))
+        return _SCORE.unpack(value)[0] if value is not None else None
+
+    def set(self, model: str, query: str, chunk_id: str, score: float) -> None:
+        self.backend.set(make_key(model, normalize_query(query), chunk_id), _SCORE.pack(score))
+
+    def __len__(self) -> int:
+        return len(self.backend)
+
+
+class Reranker:
+    """Batched, cached, time-boxed reranking; subclasses implement `_score_batch`."""
+
+    model: str
+
+    def __init__(
+        self,
+        batch_size: int = None,
+        budget_ms: float = None,
+        cache: ScoreCache = None,
+    ):
+        self.batch_size = batch_size or settings.rerank_batch_size
+        self.budget = (budget_ms if budget_ms is not None else settings.rerank_budget_ms) / 1000
+        self.grace = settings.rerank_grace_ms / 1000
+        self.cache = cache if cache is not None else ScoreCache()
+
+    async def _score_batch(self, query: str, texts: List[str]) -> List[float]:
+        """Relevance scores for one batch of passages (higher is better)."""
+        raise NotImplementedError
+
+    async def warm_up(self) -> None:
+        """Load the scoring model ahead of the first query."""
+
+    async def _score_missing(self, query: str, missing: List[dict]) -> Dict[str, float]:
+        """Score uncached candidates batch by batch, caching each batch as it completes."""
+        scores = {}
+        for i in range(0, len(missing), self.batch_size):
+            batch = missing[i:i + self.batch_size]
+            batch_scores = await self._score_batch(query, [r["content"] for r in batch])
+            for result, score in zip(batch, batch_scores):
+                scores[result["id"]] = float(score)
+                self.cache.set(self.model, query, result["id"], float(score))
+        return scores
+
+    async def rerank(self, query: str, results: List[dict], top_k: int) -> List[dict]:
+        """
+        Reorder `results` by relevance and keep the best `top_k`.
+
+        Falls back to the incoming order if scoring fails or exceeds the budget.
+        """
+        if len(results) <= 1:
+            return results[:top_k]
+
+        # Sort on the scores in hand; the cache only serves later requests
+        scores = {}
+        missing = []
+        for result in results:
+            score = self.cache.get(self.model, query, result["id"])
+            if score is None:
+                missing.append(result)
+            else:
+                scores[result["id"]] = score
+
+        if missing:
+            task = asyncio.create_task(self._score_missing(query, missing))
+            try:
+                with metrics.timed("rerank"):
+                    # shield: on timeout, scoring finishes in the background
+                    scores.update(await asyncio.wait_for(asyncio.shield(task), self.budget))
+            except asyncio.TimeoutError:
+                metrics.increment("rerank.timeout")
+                logger.warning("Rerank exceeded %.0f ms, using retrieval order", self.budget * 1000)
+                task.add_done_callback(_log_failure)
+                asyncio.get_running_loop().call_later(self.grace, _abandon, task)
+                return results[:top_k]
+            except Exception as e:
+                metrics.increment("rerank.failed")
+                logger.warning("Rerank failed (%s), using retrieval order", e)
+                return results[:top_k]
+        else:
+            metrics.increment("rerank.cached")
+
+        reranked = []
+        for rank, result in enumerate(results):
+            score = scores.get(result["id"])
+            reranked.append((-(score if score is not None else float("-inf")), rank, {**result, "rerank_score": score}))
+        reranked.sort(key=lambda item: item[:2])
+        return [result for _, _, result in reranked[:top_k]]
+
+
+def _log_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Background rerank failed: %s", task.exception())
+
+
+def _abandon(task: asyncio.Task) -> None:
+    """Stop background scoring that outlived the grace period (frees its LLM slot)."""
+    if not task.done():
+        metrics.increment("rerank.abandoned")
+        task.cancel()
+
+
+# ----------------------------------------------------------------------
+# Scorers
+# ----------------------------------------------------------------------
+
+
+class CrossEncoderReranker(Reranker):
+    """Scores pairs with a sentence-transformers cross-encoder on CPU."""
+
+    def __init__(self, model: str = None, **kwargs):
+        super().__init__(**kwargs)
+        self.model = model or settings.rerank_model
+        self._encoder = None
+        # One thread of its own: predictions run one at a time and never
+        # hold the vector store executor's threads
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cross-encoder")
+
+    def _predict(self, pairs: List[tuple]) -> List[float]:
+        if self._encoder is None:
+            from sentence_transformers import CrossEncoder
+            logger.info("Loading cross-encoder %s", self.model)
+            self._encoder = CrossEncoder(self.model, device="cpu")
+        return self._encoder.predict(pairs, batch_size=self.batch_size).tolist()
+
+    async def _run(self, pairs: List[tuple]) -> List[float]:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._predict, pairs)
+
+    async def _score_batch(self, query: str, texts: List[str]) -> List[float]:
+        return await self._run([(query, text) for text in texts])
+
+    async def warm_up(self) -> None:
+        await self._run([("warm-up", "warm-up")])
+
+
+class OllamaReranker(Reranker):
+    """Asks the chat model to rate a batch of passages in one prompt."""
+
+    def __init__(self, model: str = None, **kwargs):
+        super().__init__(**kwargs)
+        self.model = model or settings.rerank_ollama_model or settings.ollama_model
+        self._lane = asyncio.Semaphore(settings.rerank_max_concurrent)
+
+    async def _score_batch(self, query: str, texts: List[str]) -> List[float]:
+        passages = "\n\n".join(
+            f"[{i}] {text[:settings.rerank_max_chars]}" for i, text in enumerate(texts, 1)
+        )
+        prompt = OLLAMA_RERANK_PROMPT.format(query=query, passages=passages)
+
+        # Capped so queued scoring never fills the LLM wait queue, and
+        # behind generations so users' answers go first
+        async with self._lane, llm_scheduler.slot("rerank", priority=PRIORITY_BACKGROUND):
+            answer = await chat_complete(
+                [{"role": "user", "content": prompt}],
+                model=self.model,
+                options={"temperature": 0.0, "num_predict": 8 * len(texts)},
+            )
+
+        # Unrated passages score 0 and sink below rated ones
+        scores = [0.0] * len(texts)
+        for index, score in _SCORE_LINE.findall(answer):
+            if 1 <= int(index) <= len(texts):
+                scores[int(index) - 1] = float(score)
+        return scores
+
+
+def create_reranker(backend: str = None) -> Optional[Reranker]:
+    """The given reranker, or the one selected by settings (None when reranking is off)."""
+    if backend is None:
+        if not settings.rerank_enabled:
+            return None
+        backend = settings.rerank_backend
+
+    if backend == "ollama":
+        return OllamaReranker()
+    if backend == "cross-encoder":
+        if importlib.util.find_spec("sentence_transformers") is None:
+            logger.warning("sentence-transformers is not installed, reranking disabled")
+            return None
+        return CrossEncoderReranker()
+    raise ValueError(f"Unknown rerank_backend: {backend}")
@@ -1,34 +1,172 @@
-from typing import List, Optional
+import asyncio
+import logging
+from typing import List
 
+from app import metrics
 from app.config import settings
-from .vectorstore import VectorStore
+from app.singleflight import SingleFlight
+from .cache import normalize_query
+from .context import ContextBuilder
+from .lexical import BM25Index, reciprocal_rank_fusion
+from .reranker import Reranker, create_reranker
+from .vectorstore import BaseVectorStore, run_blocking
+from .versions import IndexPointer, IndexVersion, pointer_mtime
 
 # ----------------------------------------------------------------------
 
+logger = logging.getLogger(__name__)
+
 
 class Retriever:
-    """Retrieve relevant context from the vector store."""
+    """
+    Retrieve relevant context from the vector store.
+
+    Without an explicit `vectorstore`, the retriever opens the published
+    index version and can switch to a newer one with `reload()`. Queries
+    already running keep the version they started on. The service never
+    deletes a version: other workers may still be reading it, so old
+    versions are pruned by ingestion (`prune_versions`).
+    """
 
     def __init__(
         self,
-        vectorstore: VectorStore = None,
+        vectorstore: BaseVectorStore = None,
         top_k: int = None,
         similarity_threshold: float = None,
+        hybrid: bool = None,
+        lexical: BM25Index = None,
+        reranker: Reranker = None,
     ):
-        self.vectorstore = vectorstore or VectorStore()
+        self._versioned = vectorstore is None
+        if vectorstore is None:
+            pointer = IndexPointer.current()
+            self._index = IndexVersion(pointer, pointer.open(), lexical)
+        else:
+            self._index = IndexVersion(None, vectorstore, lexical)
+        self._pointer_mtime = pointer_mtime()
+        self._reload_lock = asyncio.Lock()
+
         self.top_k = top_k or settings.top_k_results
-        self.similarity_threshold = similarity_threshold or settings.similarity_threshold
+        if similarity_threshold is None:
+            similarity_threshold = settings.similarity_threshold
+        self.similarity_threshold = similarity_threshold
+        self.hybrid = settings.hybrid_search if hybrid is None else hybrid
+        self.reranker = reranker if reranker is not None else create_reranker()
+        self.context_builder = ContextBuilder()
+        self._flights = SingleFlight("retrieve") if settings.singleflight_enabled else None
+
+    @property
+    def vectorstore(self) -> BaseVectorStore:
+        """Vector store of the live index version."""
+        return self._index.vectorstore
+
+    @staticmethod
+    async def _lexical_index(index: IndexVersion) -> BM25Index:
+        """Return the version's BM25 index, reloading it if ingestion rewrote the file."""
+        if index.lexical is None or index.lexical.is_stale():
+            index.lexical = await run_blocking(BM25Index.load, index.lexical_path)
+        return index.lexical
+
+    # ------------------------------------------------------------------
+    # Index versions
+    # ------------------------------------------------------------------
+
+    async def reload(self) -> bool:
+        """Switch to the published index version; False if it is already live."""
+        if not self._versioned:
+            return False
+
+        async with self._reload_lock:
+            self._pointer_mtime = pointer_mtime()
+            pointer = await run_blocking(IndexPointer.current)
+            if pointer == self._index.pointer:
+                return False
+
+            # Open the new version fully before any query can see it
+            vectorstore = await run_blocking(pointer.open)
+            lexical = await run_blocking(BM25Index.load, pointer.bm25_index_path) if self.hybrid else None
+            old, self._index = self._index, IndexVersion(pointer, vectorstore, lexical)
+
+            metrics.increment("index.reloads")
+            logger.info("Switched index %s -> %s (%d queries in flight on the old one)", old.name, self._index.name, old.active)
+            return True
 
-    def retrieve(self, query: str, top_k: int = None) -> List[dict]:
+    async def watch(self, interval: float = None) -> None:
+        """Reload whenever the pointer file changes (run as a background task)."""
+        interval = interval or settings.index_watch_interval
+        while True:
+            await asyncio.sleep(interval)
+            if pointer_mtime() == self._pointer_mtime:
+                continue
+            try:
+                await self.reload()
+            except Exception as e:
+                logger.error("Index reload failed: %s", e)
+
+    def index_info(self) -> dict:
+        pointer = self._index.pointer
+        return {
+            "collection": self._index.name,
+            "version": pointer.version if pointer else None,
+            "queries_in_flight": self._index.active,
+        }
+
+    @staticmethod
+    def _release(index: IndexVersion) -> None:
+        index.active -= 1
+
+    # ------------------------------------------------------------------
+    # Retrieval
+    # ------------------------------------------------------------------
+
+    async def retrieve(self, query: str, top_k: int = None) -> List[dict]:
         """Retrieve relevant documents for a query."""
-        top_k = top_k or self.top_k
+        if self._flights is None:
+            return await self._retrieve_and_rerank(query, top_k)
+
+        # Identical questions arriving together share one search
+        key = (normalize_query(query), top_k, self.hybrid, self.similarity_threshold)
+        return list(await self._flights.do(key, lambda: self._retrieve_and_rerank(query, top_k)))
+
+    async def _retrieve_and_rerank(self, query: str, top_k: int = None) -> List[dict]:
+        if self.reranker is None:
+            return await self._retrieve(query, top_k or self.top_k)
+
+        # Rerank a wider pool and keep only the best few
+        top_k = top_k or settings.rerank_top_k
+        candidates = await self._retrieve(query, max(top_k, settings.rerank_candidates))
+        results = await self.reranker.rerank(query, candidates, top_k)
+        logger.debug("%d results after reranking %d candidates", len(results), len(candidates))
+        return results
+
+    async def _retrieve(self, query: str, top_k: int) -> List[dict]:
+        """First-stage retrieval: vector search, optionally fused with BM25."""
+        # Pin the live version so a concurrent reload cannot delete it under us
+        index = self._index
+        index.active += 1
+        try:
+            if self.hybrid:
+                # Over-fetch from both indexes, then fuse by reciprocal rank
+                candidates = max(top_k, settings.hybrid_candidates)
+                lexical = await self._lexical_index(index)
+                results, lexical_results = await asyncio.gather(
+                    index.vectorstore.search(query, top_k=candidates),
+                    self._lexical_search(lexical, query, candidates),
+                )
+            else:
+                results = await index.vectorstore.search(query, top_k=top_k)
+                lexical_results = []
+        finally:
+            self._release(index)
 
-        results = self.vectorstore.search(query, top_k=top_k)
+        return self._filter_and_fuse(query, results, lexical_results, top_k)
 
-        print(f"[RAG] Query: {query[:50]}...")
-        print(f"[RAG] Found {len(results)} results before filtering")
-        for r in results:
-            print(f"[RAG]   - Score: {r.get('score', 'N/A')}, Source: {r.get('metadata', {}).get('source', 'N/A')}")
+    def _filter_and_fuse(self, query: str, results: List[dict], lexical_results: List[dict], top_k: int) -> List[dict]:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Query: %s...", query[:50])
+            logger.debug("Found %d vector / %d lexical results before filtering", len(results), len(lexical_results))
+            for r in results:
+                logger.debug("  - Score: %s, Source: %s", r.get("score", "N/A"), r.get("metadata", {}).get("source", "N/A"))
 
         # Filter by similarity threshold (lowered for better recall)
         filtered_results = [
@@ -36,49 +174,134 @@ class Retriever:
             if r.get("score", 0) >= self.similarity_threshold
         ]
 
-        print(f"[RAG] {len(filtered_results)} results after filtering (threshold: {self.similarity_threshold})")
+        logger.debug("%d results after filtering (threshold: %s)", len(filtered_results), self.similarity_threshold)
+
+        if self.hybrid:
+            filtered_results = reciprocal_rank_fusion([filtered_results, lexical_results])[:top_k]
+            logger.debug("%d results after hybrid fusion", len(filtered_results))
 
         return filtered_results
 
-    def get_context(self, query: str, top_k: int = None) -> str:
+    # ------------------------------------------------------------------
+    # Batches
+    # ------------------------------------------------------------------
+
+    async def retrieve_many(self, queries: List[str], top_k: int = None) -> List[List[dict]]:
+        """
+        Retrieve documents for many queries at once.
+
+        The queries are embedded in batched calls and searched with one
+        multi-query index lookup; repeated queries are searched once.
+        Results are returned in the order of `queries`.
+        """
+        # normalized query -> first spelling of it, which is searched
+        first = {}
+        for query in queries:
+            first.setdefault(normalize_query(query), query)
+        unique = list(first.values())
+        if not unique:
+            return []
+
+        if self.reranker is None:
+            top_k = top_k or self.top_k
+            found = await self._retrieve_many(unique, top_k)
+        else:
+            top_k = top_k or settings.rerank_top_k
+            candidates = await self._retrieve_many(unique, max(top_k, settings.rerank_candidates))
+            found = await asyncio.gather(*(
+                self.reranker.rerank(query, results, top_k) for query, results in zip(unique, candidates)
+            ))
+
+        by_key = dict(zip(first, found))
+        return [list(by_key[normalize_query(query)]) for query in queries]
+
+    async def _retrieve_many(self, queries: List[str], top_k: int) -> List[List[dict]]:
+        """First-stage retrieval for a batch of queries."""
+        index = self._index
+        index.active += 1
+        try:
+            if self.hybrid:
+                candidates = max(top_k, settings.hybrid_candidates)
+                lexical = await self._lexical_index(index)
+                results, lexical_results = await asyncio.gather(
+                    index.vectorstore.search_many(queries, top_k=candidates),
+                    self._lexical_search_many(lexical, queries, candidates),
+                )
+            else:
+                results = await index.vectorstore.search_many(queries, top_k=top_k)
+                lexical_results = [[] for _ in queries]
+        finally:
+            self._release(index)
+
+        return [
+            self._filter_and_fuse(query, vector, lexical, top_k)
+            for query, vector, lexical in zip(queries, results, lexical_results)
+        ]
+
+    @staticmethod
+    async def _lexical_search_many(lexical: BM25Index, queries: List[str], top_k: int) -> List[List[dict]]:
+        with metrics.timed("lexical"):
+            return await run_blocking(lambda: [lexical.search(query, top_k) for query in queries])
+
+    @staticmethod
+    async def _lexical_search(lexical: BM25Index, query: str, top_k: int) -> List[dict]:
+        with metrics.timed("lexical"):
+            return await run_blocking(lexical.search, query, top_k)
+
+    async def get_context(self, query: str, top_k: int = None) -> str:
         """Get formatted context string for the LLM prompt."""
-        results = self.retrieve(query, top_k=top_k)
+        results = await self.retrieve(query, top_k=top_k)
+        return self.format_context(results)
 
+    def format_context(self, results: List[dict]) -> str:
+        """Format retrieved results as a context string for the LLM prompt."""
         if not results:
-            print("[RAG] No context found - using general knowledge")
+            logger.debug("No context found - using general knowledge")
             return ""
 
-        context_parts = []
-        for i, result in enumerate(results, 1):
-            source = result["metadata"].get("source", "Unknown")
-            content = result["content"]
-            context_parts.append(f"[Source {i}: {source}]\n{content}")
+        with metrics.timed("context"):
+            return self.context_builder.build(results)
 
-        return "\n\n---\n\n".join(context_parts)
-
-    def get_context_with_sources(self, query: str, top_k: int = None) -> dict:
+    async def get_context_with_sources(self, query: str, top_k: int = None) -> dict:
         """Get context and source information for citations."""
-        results = self.retrieve(query, top_k=top_k)
+        results = await self.retrieve(query, top_k=top_k)
 
         if not results:
             return {"context": "", "sources": []}
 
-        context_parts = []
+        return {
+            "context": self.format_context(results),
+            "sources": self.sources(results),
+        }
+
+    @staticmethod
+    def sources(results: List[dict]) -> List[dict]:
+        """
+        Source and score of each result, numbered for citations.
+
+        `score` is the score the results were ranked by, named in
+        `score_type`: "rerank" (reranker relevance), "rrf" (hybrid
+        reciprocal-rank fusion) or "similarity" (cosine, vector-only).
+        `similarity` is the vector score, None for lexical-only hits.
+        """
         sources = []
 
         for i, result in enumerate(results, 1):
             source = result["metadata"].get("source", "Unknown")
-            content = result["content"]
-            score = result.get("score", 0)
+            if result.get("rerank_score") is not None:
+                score, score_type = result["rerank_score"], "rerank"
+            elif result.get("rrf_score") is not None:
+                score, score_type = result["rrf_score"], "rrf"
+            else:
+                score, score_type = result.get("score"), "similarity"
 
-            context_parts.append(f"[Source {i}: {source}]\n{content}")
             sources.append({
                 "index": i,
+                "id": result["id"],
                 "source": source,
                 "score": score,
+                "score_type": score_type,
+                "similarity": result.get("score"),
             })
 
-        return {
-            "context": "\n\n---\n\n".join(context_parts),
-            "sources": sources,
-        }
+        return sources
@@ -1,17 +1,161 @@
-from typing import List, Optional
+import asyncio
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
 
-import chromadb
-from chromadb.config import Settings as ChromaSettings
-from langchain.schema import Document
-
+from app import metrics
 from app.config import settings
 from .embeddings import OllamaEmbeddingFunction
 
+# chromadb and langchain are imported on first use: the API server does not
+# need them at import time, and the NumPy backend does not need chromadb
+if TYPE_CHECKING:
+    from langchain.schema import Document
+
 # ----------------------------------------------------------------------
 
+logger = logging.getLogger(__name__)
+
+# Bounded pool for blocking ChromaDB calls made from async code
+_executor = ThreadPoolExecutor(
+    max_workers=settings.vectorstore_max_workers,
+    thread_name_prefix="vectorstore",
+)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking vector store call on the bounded executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(func, *args, **kwargs))
+
+
+class BaseVectorStore:
+    """
+    Interface shared by the vector store backends.
+
+    Subclasses set `persist_dir`, `collection_name` and `embedding_function`
+    and implement the storage methods; query embedding, versioning and
+    async search are common.
+    """
+
+    persist_dir: str
+    collection_name: str
+    embedding_function: OllamaEmbeddingFunction
+
+    def add_documents(self, documents: List["Document"]) -> None:
+        """Embed and upsert chunks."""
+        raise NotImplementedError
+
+    def add_embedded(self, documents: List["Document"], embeddings: List[List[float]]) -> None:
+        """Upsert chunks whose embeddings were computed by the caller."""
+        raise NotImplementedError
+
+    def update_metadata(self, documents: List["Document"]) -> None:
+        """Refresh metadata of already indexed chunks without re-embedding."""
+        raise NotImplementedError
+
+    def delete_ids(self, ids: List[str]) -> None:
+        """Delete chunks by ID."""
+        raise NotImplementedError
+
+    # add_embedded, update_metadata and delete_ids do not bump the index
+    # version: callers batch their changes and call mark_updated() once
+
+    def query_embeddings(self, embeddings: List[List[float]], top_k: int = None) -> List[List[dict]]:
+        """Nearest chunks for each query embedding (blocking)."""
+        raise NotImplementedError
+
+    def delete_collection(self) -> None:
+        """Delete the entire collection."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        """Number of indexed chunks."""
+        raise NotImplementedError
+
+    def get_stats(self) -> dict:
+        """Get collection statistics."""
+        raise NotImplementedError
+
+    def get_documents(self) -> List[tuple]:
+        """Return (id, content, metadata) for every chunk in the collection."""
+        raise NotImplementedError
+
+    def iter_embedded(self, batch_size: int = 1000) -> Iterator[Tuple[List["Document"], List[List[float]]]]:
+        """Yield batches of stored chunks together with their embeddings."""
+        raise NotImplementedError
+
+    def copy_to(self, target: "BaseVectorStore", batch_size: int = 1000) -> int:
+        """Copy every chunk and its embedding into `target` without re-embedding."""
+        copied = 0
+        for documents, embeddings in self.iter_embedded(batch_size):
+            target.add_embedded(documents, embeddings)
+            copied += len(documents)
+        return copied
+
+    def destroy(self) -> None:
+        """Delete the collection for good, including its version file."""
+        self.delete_collection()
+        self._version_file.unlink(missing_ok=True)
+
+    async def search(
+        self,
+        query: str,
+        top_k: int = None,
+    ) -> List[dict]:
+        """Search for similar documents."""
+        top_k = top_k or settings.top_k_results
+
+        # Embed on the event loop (async HTTP), search on the executor
+        with metrics.timed("embed"):
+            query_embeddings = await self.embedding_function.embed_query_async(query)
+
+        with metrics.timed("search"):
+            results = await run_blocking(self.query_embeddings, query_embeddings, top_k)
+
+        return results[0]
+
+    async def search_many(
+        self,
+        queries: List[str],
+        top_k: int = None,
+    ) -> List[List[dict]]:
+        """Search for several queries with one batched embedding call and one index query."""
+        if not queries:
+            return []
+        top_k = top_k or settings.top_k_results
+
+        with metrics.timed("embed"):
+            query_embeddings = await self.embedding_function.embed_query_async(list(queries))
+
+        with metrics.timed("search"):
+            return await run_blocking(self.query_embeddings, query_embeddings, top_k)
+
+    @property
+    def _version_file(self) -> Path:
+        return Path(self.persist_dir) / f"{self.collection_name}.version"
 
-class VectorStore:
+    def mark_updated(self) -> None:
+        """Record that the collection changed, invalidating dependent caches."""
+        self._version_file.write_text(uuid.uuid4().hex)
+
+    def index_version(self) -> Optional[str]:
+        """Return the current index version (changes on every ingestion)."""
+        try:
+            return self._version_file.read_text().strip()
+        except FileNotFoundError:
+            return None
+
+    def list_documents(self) -> List[str]:
+        """List all unique source documents in the collection."""
+        sources = {metadata["source"] for _, _, metadata in self.get_documents() if "source" in metadata}
+        return sorted(sources)
+
+
+class VectorStore(BaseVectorStore):
     """ChromaDB vector store for document storage and retrieval."""
 
     def __init__(
@@ -26,10 +170,7 @@ class VectorStore:
         Path(self.persist_dir).mkdir(parents=True, exist_ok=True)
 
         # Initialize ChromaDB client with persistence
-        self.client = chromadb.PersistentClient(
-            path=self.persist_dir,
-            settings=ChromaSettings(anonymized_telemetry=False),
-        )
+        self.client = _chroma_client(self.persist_dir)
 
         # Initialize embedding function
         self.embedding_function = OllamaEmbeddingFunction()
@@ -41,10 +182,10 @@ class VectorStore:
             metadata={"hnsw:space": "cosine"},
         )
 
-    def add_documents(self, documents: List[Document]) -> None:
+    def add_documents(self, documents: List["Document"]) -> None:
         """Add documents to the vector store."""
         if not documents:
-            print("No documents to add")
+            logger.info("No documents to add")
             return
 
         # Prepare data for ChromaDB
@@ -53,55 +194,88 @@ class VectorStore:
         metadatas = []
 
         for i, doc in enumerate(documents):
-            # Create unique ID based on source and chunk index
+            # Prefer the content-derived ID assigned by the chunker
             source = doc.metadata.get("source", "unknown")
             chunk_idx = doc.metadata.get("chunk_index", i)
-            doc_id = f"{source}_{chunk_idx}"
+            doc_id = doc.metadata.get("chunk_id") or f"{source}_{chunk_idx}"
 
             ids.append(doc_id)
             texts.append(doc.page_content)
             metadatas.append(doc.metadata)
 
-        # Add to collection in batches
-        batch_size = 50
+        # Add to collection in batches large enough to keep every
+        # embedding worker busy
+        batch_size = settings.embedding_batch_size * settings.embedding_concurrency
         for i in range(0, len(ids), batch_size):
             batch_ids = ids[i:i + batch_size]
             batch_texts = texts[i:i + batch_size]
             batch_metadatas = metadatas[i:i + batch_size]
 
-            print(f"Adding batch {i // batch_size + 1}/{(len(ids) - 1) // batch_size + 1}...")
+            logger.info("Adding batch %d/%d", i // batch_size + 1, (len(ids) - 1) // batch_size + 1)
 
-            self.collection.add(
+            self.collection.upsert(
                 ids=batch_ids,
                 documents=batch_texts,
                 metadatas=batch_metadatas,
             )
 
-        print(f"Added {len(ids)} documents to collection '{self.collection_name}'")
+        self.mark_updated()
+        logger.info("Added %d documents to collection '%s'", len(ids), self.collection_name)
 
-    def search(
-        self,
-        query: str,
-        top_k: int = None,
-    ) -> List[dict]:
-        """Search for similar documents."""
-        top_k = top_k or settings.top_k_results
+    def add_embedded(self, documents: List["Document"], embeddings: List[List[float]]) -> None:
+        """Upsert chunks whose embeddings were computed by the caller."""
+        self.collection.upsert(
+            ids=[doc.metadata["chunk_id"] for doc in documents],
+            embeddings=embeddings,
+            documents=[doc.page_content for doc in documents],
+            metadatas=[doc.metadata for doc in documents],
+        )
+
+    def update_metadata(self, documents: List["Document"]) -> None:
+        """Refresh metadata of already indexed chunks without re-embedding."""
+        if not documents:
+            return
+
+        batch_size = 500
+        for i in range(0, len(documents), batch_size):
+            batch = documents[i:i + batch_size]
+            self.collection.update(
+                ids=[doc.metadata["chunk_id"] for doc in batch],
+                metadatas=[doc.metadata for doc in batch],
+            )
+
+    def delete_ids(self, ids: List[str]) -> None:
+        """Delete chunks by ID."""
+        if not ids:
+            return
+
+        batch_size = 500
+        for i in range(0, len(ids), batch_size):
+            self.collection.delete(ids=ids[i:i + batch_size])
 
+        logger.info("Deleted %d chunks from collection '%s'", len(ids), self.collection_name)
+
+    def query_embeddings(self, embeddings: List[List[float]], top_k: int = None) -> List[List[dict]]:
+        """Nearest chunks for each query embedding (blocking)."""
         results = self.collection.query(
-            query_texts=[query],
-            n_results=top_k,
+            query_embeddings=embeddings,
+            n_results=top_k or settings.top_k_results,
             include=["documents", "metadatas", "distances"],
         )
+        return [self._format_results(results, i) for i in range(len(embeddings))]
 
-        # Format results
+    @staticmethod
+    def _format_results(results: dict, index: int = 0) -> List[dict]:
+        """Convert a ChromaDB query result into a list of result dicts."""
         formatted_results = []
-        if results["documents"] and results["documents"][0]:
-            for i in range(len(results["documents"][0])):
+        if results["documents"] and results["documents"][index]:
+            for i in range(len(results["documents"][index])):
                 formatted_results.append({
-                    "content": results["documents"][0][i],
-                    "metadata": results["metadatas"][0][i] if results["metadatas"] else {},
-                    "distance": results["distances"][0][i] if results["distances"] else None,
-                    "score": 1 - results["distances"][0][i] if results["distances"] else None,
+                    "id": results["ids"][index][i],
+                    "content": results["documents"][index][i],
+                    "metadata": results["metadatas"][index][i] if results["metadatas"] else {},
+                    "distance": results["distances"][index][i] if results["distances"] else None,
+                    "score": 1 - results["distances"][index][i] if results["distances"] else None,
                 })
 
         return formatted_results
@@ -109,16 +283,43 @@ class VectorStore:
     def delete_collection(self) -> None:
         """Delete the entire collection."""
         self.client.delete_collection(self.collection_name)
-        print(f"Deleted collection '{self.collection_name}'")
+        self.mark_updated()
+        logger.info("Deleted collection '%s'", self.collection_name)
+
+    def count(self) -> int:
+        """Number of indexed chunks."""
+        return self.collection.count()
 
     def get_stats(self) -> dict:
         """Get collection statistics."""
         return {
+            "backend": "chroma",
             "collection_name": self.collection_name,
             "document_count": self.collection.count(),
             "persist_dir": self.persist_dir,
         }
 
+    def get_documents(self) -> List[tuple]:
+        """Return (id, content, metadata) for every chunk in the collection."""
+        results = self.collection.get(include=["documents", "metadatas"])
+        return list(zip(results["ids"], results["documents"], results["metadatas"]))
+
+    def iter_embedded(self, batch_size: int = 1000) -> Iterator[Tuple[List["Document"], List[List[float]]]]:
+        """Yield batches of stored chunks together with their embeddings."""
+        from langchain.schema import Document
+
+        for offset in range(0, self.collection.count(), batch_size):
+            results = self.collection.get(
+                include=["documents", "metadatas", "embeddings"],
+                limit=batch_size,
+                offset=offset,
+            )
+            documents = [
+                Document(page_content=content, metadata={**metadata, "chunk_id": doc_id})
+                for doc_id, content, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+            ]
+            yield documents, [list(map(float, e)) for e in results["embeddings"]]
+
     def list_documents(self) -> List[str]:
         """List all unique source documents in the collection."""
         results = self.collection.get(include=["metadatas"])
@@ -127,3 +328,45 @@ class VectorStore:
             if "source" in metadata:
                 sources.add(metadata["source"])
         return sorted(list(sources))
+
+
+_chroma_clients: Dict[str, object] = {}
+
+
+def _chroma_client(persist_dir: str):
+    """One ChromaDB client per directory, shared by every collection in it."""
+    client = _chroma_clients.get(persist_dir)
+    if client is None:
+        import chromadb
+        from chromadb.config import Settings as ChromaSettings
+
+        client = _chroma_clients[persist_dir] = chromadb.PersistentClient(
+            path=persist_dir,
+            settings=ChromaSettings(anonymized_telemetry=False),
+        )
+    return client
+
+
+def list_collections() -> List[str]:
+    """Names of the collections stored by the configured backend."""
+    if settings.vector_backend == "numpy":
+        root = Path(settings.numpy_persist_dir)
+        return sorted(p.name for p in root.iterdir() if p.is_dir()) if root.exists() else []
+
+    client = _chroma_client(settings.chroma_persist_dir)
+    # ChromaDB < 0.6 returns Collection objects; 0.6 returns names (CollectionName
+    # objects whose .name raises NotImplementedError), so check for str first
+    return sorted(
+        c if isinstance(c, str) else getattr(c, "name", None) or str(c)
+        for c in client.list_collections()
+    )
+
+
+def create_vectorstore(persist_dir: str = None, collection_name: str = None) -> BaseVectorStore:
+    """Open the vector store backend selected by `vector_backend`."""
+    if settings.vector_backend == "numpy":
+        from .numpy_store import NumpyVectorStore
+        return NumpyVectorStore(persist_dir=persist_dir, collection_name=collection_name)
+    if settings.vector_backend != "chroma":
+        raise ValueError(f"Unknown vector_backend: {settings.vector_backend}")
+    return VectorStore(persist_dir=persist_dir, collection_name=collection_name)
@@ -0,0 +1,142 @@
+"""
+Versioned indexes and the pointer that selects the live one.
+
+Ingestion builds every version into its own collection and BM25 file and
+then publishes it by atomically replacing a small pointer file:
+
+    {"version": "20261018T120000-3fa2c1",
+     "collection": "eda_knowledge_base__v20261018T120000-3fa2c1",
+     "bm25_index_path": ".../bm25_index.20261018T120000-3fa2c1.json"}
+
+The running service follows the pointer (see `Retriever.reload`), so a
+re-ingest never modifies the collection that queries are reading. Without
+a pointer file the unversioned `chroma_collection_name` and
+`bm25_index_path` are used, as before versioning.
+"""
+
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from app.config import settings
+from .lexical import BM25Index
+from .vectorstore import BaseVectorStore, create_vectorstore, list_collections
+
+# ----------------------------------------------------------------------
+
+VERSION_SEPARATOR = "__v"
+
+
+def new_version() -> str:
+    """Sortable, unique version id."""
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+class IndexPointer:
+    """Names of the collection and BM25 file that make up one index version."""
+
+    def __init__(self, collection: str, bm25_index_path: str, version: str = None):
+        self.collection = collection
+        self.bm25_index_path = bm25_index_path
+        self.version = version
+
+    @classmethod
+    def for_version(cls, version: str) -> "IndexPointer":
+        bm25_path = Path(settings.bm25_index_path)
+        return cls(
+            collection=f"{settings.chroma_collection_name}{VERSION_SEPARATOR}{version}",
+            bm25_index_path=str(bm25_path.with_name(f"{bm25_path.stem}.{version}{bm25_path.suffix}")),
+            version=version,
+        )
+
+    @classmethod
+    def current(cls, path: str = None) -> "IndexPointer":
+        """The published version, or the unversioned index if none was published."""
+        try:
+            data = json.loads(Path(path or settings.index_pointer_path).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return cls(settings.chroma_collection_name, settings.bm25_index_path)
+        return cls(data["collection"], data["bm25_index_path"], data.get("version"))
+
+    def publish(self, path: str = None) -> None:
+        """Make this the live version (atomic replace of the pointer file)."""
+        path = Path(path or settings.index_pointer_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps({
+                "version": self.version,
+                "collection": self.collection,
+                "bm25_index_path": self.bm25_index_path,
+                "published_at": time.time(),
+            }, indent=2),
+            encoding="utf-8",
+        )
+        os.replace(tmp_path, path)
+
+    def open(self) -> BaseVectorStore:
+        return create_vectorstore(collection_name=self.collection)
+
+    def destroy(self) -> None:
+        """Delete this version's collection and BM25 file."""
+        self.open().destroy()
+        Path(self.bm25_index_path).unlink(missing_ok=True)
+
+    def __eq__(self, other) -> bool:
+        return (
+            isinstance(other, IndexPointer)
+            and (self.collection, self.bm25_index_path) == (other.collection, other.bm25_index_path)
+        )
+
+    def __repr__(self) -> str:
+        return f"IndexPointer({self.collection!r})"
+
+
+def pointer_mtime(path: str = None) -> Optional[float]:
+    try:
+        return Path(path or settings.index_pointer_path).stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def prune_versions(keep: Iterable[str], keep_latest: int = 0) -> List[str]:
+    """
+    Delete versioned collections (and their BM25 files), except those named
+    in `keep` and the `keep_latest` newest.
+    """
+    keep = set(keep)
+    prefix = settings.chroma_collection_name + VERSION_SEPARATOR
+    # Version ids sort by creation time
+    versioned = sorted(name for name in list_collections() if name.startswith(prefix))
+    if keep_latest > 0:
+        keep.update(versioned[-keep_latest:])
+
+    removed = []
+    for name in versioned:
+        if name not in keep:
+            IndexPointer.for_version(name[len(prefix):]).destroy()
+            removed.append(name)
+    return removed
+
+
+# ----------------------------------------------------------------------
+# Live versions in the service
+# ----------------------------------------------------------------------
+
+
+class IndexVersion:
+    """An opened index version and the number of queries running against it."""
+
+    def __init__(self, pointer: Optional[IndexPointer], vectorstore: BaseVectorStore, lexical: BM25Index = None):
+        self.pointer = pointer
+        self.vectorstore = vectorstore
+        self.lexical = lexical
+        self.lexical_path = lexical.path if lexical is not None else (pointer.bm25_index_path if pointer else None)
+        self.active = 0
+
+    @property
+    def name(self) -> str:
+        return self.vectorstore.collection_name
@@ -0,0 +1,161 @@
+"""
+Admission control for LLM calls.
+
+At most `llm_max_concurrent` generations run against Ollama at once.
+Further requests wait in a bounded queue; when it is full they are
+rejected immediately with a retry-after estimate instead of piling up
+until the HTTP timeout. Waiters are served by priority, and round-robin
+across users within a priority, so one user with many open tabs cannot
+starve everybody else.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+from app import metrics
+from app.config import settings
+
+# ----------------------------------------------------------------------
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+
+class QueueFullError(Exception):
+    """Raised when the LLM wait queue is full."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Server is busy, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class LLMScheduler:
+    """Concurrency cap with a bounded, per-user fair wait queue."""
+
+    def __init__(self, max_concurrent: int = None, max_queue: int = None):
+        self.max_concurrent = max_concurrent or settings.llm_max_concurrent
+        self.max_queue = max_queue if max_queue is not None else settings.llm_max_queue
+
+        self._active = 0
+        # priority -> user -> waiting futures
+        self._waiting: Dict[int, OrderedDict] = {}
+        self._queued = 0
+
+        # Running averages for retry-after estimates and metrics
+        self._avg_hold = 10.0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._admitted = 0
+
+    # ------------------------------------------------------------------
+
+    def _retry_after(self) -> float:
+        return max(1.0, self._avg_hold * (self._queued + 1) / self.max_concurrent)
+
+    def _enqueue(self, user: str, priority: int) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        users = self._waiting.setdefault(priority, OrderedDict())
+        users.setdefault(user, deque()).append(future)
+        self._queued += 1
+        return future
+
+    def _dequeue(self, user: str, priority: int, future: asyncio.Future) -> None:
+        users = self._waiting.get(priority, {})
+        waiters = users.get(user)
+        if waiters and future in waiters:
+            waiters.remove(future)
+            self._queued -= 1
+            if not waiters:
+                del users[user]
+
+    def _dispatch(self) -> None:
+        """Hand free slots to waiters: best priority first, round-robin by user."""
+        while self._active < self.max_concurrent and self._queued:
+            priority = min(p for p, users in self._waiting.items() if users)
+            users = self._waiting[priority]
+
+            user, waiters = next(iter(users.items()))
+            future = waiters.popleft()
+            self._queued -= 1
+            if waiters:
+                users.move_to_end(user)
+            else:
+                del users[user]
+
+            if not future.done():
+                self._active += 1
+                future.set_result(None)
+
+    async def _acquire(self, user: str, priority: int) -> float:
+        if self._active < self.max_concurrent and not self._queued:
+            self._active += 1
+            return 0.0
+
+        if self._queued >= self.max_queue:
+            metrics.increment("scheduler.rejected")
+            raise QueueFullError(self._retry_after())
+
+        started = time.monotonic()
+        future = self._enqueue(user, priority)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we were cancelled
+                self._release()
+            else:
+                self._dequeue(user, priority, future)
+            raise
+
+        return time.monotonic() - started
+
+    def _release(self) -> None:
+        self._active -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, user: str, priority: int = PRIORITY_INTERACTIVE) -> AsyncIterator[float]:
+        """
+        Hold one LLM slot for the duration of the block.
+
+        Yields:
+            Seconds spent waiting in the queue
+
+        Raises:
+            QueueFullError: If the wait queue is full
+        """
+        waited = await self._acquire(user, priority)
+
+        self._admitted += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        metrics.increment("scheduler.admitted")
+
+        started = time.monotonic()
+        try:
+            yield waited
+        finally:
+            held = time.monotonic() - started
+            self._avg_hold = 0.9 * self._avg_hold + 0.1 * held
+            self._release()
+
+    def get_stats(self) -> dict:
+        """Current queue depth and wait-time statistics."""
+        return {
+            "active": self._active,
+            "queued": self._queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self._admitted,
+            "rejected": metrics.snapshot("scheduler.").get("rejected", 0),
+            "avg_wait_seconds": round(self._wait_total / self._admitted, 3) if self._admitted else 0.0,
+            "max_wait_seconds": round(self._wait_max, 3),
+            "avg_generation_seconds": round(self._avg_hold, 3),
+        }
+
+
+# Shared by every LLM call in the process
+llm_scheduler = LLMScheduler()
@@ -8,4 +8,12 @@ class Message(BaseModel):
 
 class ChatRequest(BaseModel):
     messages: list[Message]
-    session_id: str | None = None
\ No newline at end of file
+    session_id: str | None = None
+    bypass_cache: bool = False  # Skip the semantic answer cache
+
+
+class SearchBatchRequest(BaseModel):
+    queries: list[str]
+    top_k: int = 5
+    include_context: bool = False  # Also return the formatted prompt context per query
+    stream: bool | None = None  # NDJSON as results are ready (default: above search_batch_size queries)
@@ -0,0 +1,160 @@
+"""
+Single-flight deduplication of identical concurrent work.
+
+When many users ask the same question at once, each request would embed
+the query, search the index and generate an answer on its own.
+`SingleFlight` runs concurrent calls with the same key once and hands
+the result to every caller. `StreamFlights` does the same for token
+streams: one generation is fanned out to every subscriber, and late
+joiners first receive the tokens emitted so far.
+
+Shared work is cancelled only when nobody is waiting for it any more.
+"""
+
+import asyncio
+from typing import AsyncGenerator, Awaitable, Callable, Dict, Hashable, List
+
+from app import metrics
+
+# ----------------------------------------------------------------------
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Share the result of concurrent calls with the same key."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        """Await `fn()`, or the identical call already in flight."""
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.create_task(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            metrics.increment(f"singleflight.{self.name}.leader")
+        else:
+            metrics.increment(f"singleflight.{self.name}.shared")
+
+        call.waiters += 1
+        try:
+            # shield: one caller giving up must not cancel the others' result
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+                self._forget(key, call)
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+# ----------------------------------------------------------------------
+# Token streams
+# ----------------------------------------------------------------------
+
+
+class _SharedStream:
+    """One producer task reading a stream, any number of replaying readers."""
+
+    def __init__(self, source: AsyncGenerator[str, None], on_finish: Callable[[], None]):
+        self.emitted: List[str] = []
+        self.error: Exception = None
+        self.done = False
+        self.subscribers = 0
+        self._changed = asyncio.Condition()
+        self._on_finish = on_finish
+        self._task = asyncio.create_task(self._produce(source))
+
+    async def _produce(self, source: AsyncGenerator[str, None]) -> None:
+        try:
+            async for chunk in source:
+                self.emitted.append(chunk)
+                async with self._changed:
+                    self._changed.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            # Closing the source closes the Ollama response
+            await source.aclose()
+            self.done = True
+            self._on_finish()
+            async with self._changed:
+                self._changed.notify_all()
+
+    def subscribe(self) -> AsyncGenerator[str, None]:
+        # Counted now, not on first iteration, so the producer cannot be
+        # cancelled between joining and reading
+        self.subscribers += 1
+        return self._follow()
+
+    async def _follow(self) -> AsyncGenerator[str, None]:
+        """Every chunk from the start of the stream, then new ones as they arrive."""
+        index = 0
+        try:
+            while True:
+                if index < len(self.emitted):
+                    index += 1
+                    yield self.emitted[index - 1]
+                    continue
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                async with self._changed:
+                    await self._changed.wait_for(lambda: self.done or index < len(self.emitted))
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                # Last reader left: stop generating and let new requests start afresh
+                self._on_finish()
+                self._task.cancel()
+
+
+class StreamFlights:
+    """Fan one token stream out to every concurrent request with the same key."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._streams: Dict[Hashable, _SharedStream] = {}
+
+    def subscribe(
+        self,
+        key: Hashable,
+        factory: Callable[[], AsyncGenerator[str, None]],
+    ) -> AsyncGenerator[str, None]:
+        """
+        Join the stream for `key`, starting it with `factory()` if none is running.
+
+        The returned generator replays the chunks already emitted, then
+        follows the live stream. Close it to unsubscribe.
+        """
+        stream = self._streams.get(key)
+        if stream is None:
+            stream = _SharedStream(factory(), lambda: self._forget(key, stream))
+            self._streams[key] = stream
+            metrics.increment(f"singleflight.{self.name}.leader")
+        else:
+            metrics.increment(f"singleflight.{self.name}.shared")
+        return stream.subscribe()
+
+    def _forget(self, key: Hashable, stream: _SharedStream) -> None:
+        if self._streams.get(key) is stream:
+            del self._streams[key]
+
+    def __len__(self) -> int:
+        return len(self._streams)
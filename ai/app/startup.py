@@ -0,0 +1,166 @@
+"""
+Service startup: warm-up and readiness.
+
+The FastAPI lifespan opens the index once, then warms up in the
+background. The chat and embedding models are loaded on every Ollama
+host, with `keep_alive` so that they stay resident. The reranker model
+is loaded, and one retrieval touches the index. `/health` answers 503
+until each pool has one warm host and the retrieval has run; hosts that
+are down keep being retried after that. It reports how long each step
+took:
+
+    imports          importing app.main and its dependencies
+    open_index       opening the live index (ChromaDB or NumPy)
+    chat_model       loading the chat model on the first chat host to answer
+    embedding_model  loading the embedding model on the first embedding host to answer
+    reranker         loading the cross-encoder (when reranking is on)
+    index            first retrieval (query embedding, search, BM25 load)
+    total            from the start of the imports until ready
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional
+
+from app.backends import BackendPool, chat_pool, embedding_pool
+from app.clients import get_async_client
+from app.config import settings
+
+# ----------------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+
+
+class StartupState:
+    """Readiness flag plus a per-step cold-start breakdown."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.ready = False
+        self.error: Optional[str] = None
+        # warm-up step -> backends where the model is loaded
+        self.warm: Dict[str, List[str]] = {}
+
+    def imports_done(self, started: float) -> None:
+        """Record the import phase, which began at perf_counter() `started`."""
+        self.started = started
+        self.stages["imports"] = time.perf_counter() - started
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = time.perf_counter() - started
+
+    def mark_ready(self) -> None:
+        self.stages["total"] = time.perf_counter() - self.started
+        self.ready = True
+        self.error = None
+        logger.info(
+            "Ready in %.2fs (%s)",
+            self.stages["total"],
+            ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.stages.items() if name != "total"),
+        )
+
+    def get_stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "warm": self.warm,
+            "stages_ms": {name: round(seconds * 1000, 1) for name, seconds in self.stages.items()},
+        }
+
+
+startup = StartupState()
+
+
+# ----------------------------------------------------------------------
+# Warm-up
+# ----------------------------------------------------------------------
+
+
+async def _load_chat_model(base_url: str) -> None:
+    """An empty chat request loads the model without generating anything."""
+    response = await get_async_client().post(
+        f"{base_url}/api/chat",
+        json={"model": settings.ollama_model, "messages": [], "keep_alive": settings.ollama_keep_alive},
+        timeout=settings.ollama_timeout,
+    )
+    response.raise_for_status()
+
+
+async def _load_embedding_model(base_url: str) -> None:
+    response = await get_async_client().post(
+        f"{base_url}/api/embeddings",
+        json={"model": settings.embedding_model, "prompt": "warm-up", "keep_alive": settings.ollama_keep_alive},
+        timeout=settings.embedding_timeout,
+    )
+    response.raise_for_status()
+
+
+async def _retry(what: str, step: Callable[[], Awaitable]) -> None:
+    """Run `step()` until it succeeds, waiting backend_health_interval between attempts."""
+    while True:
+        try:
+            return await step()
+        except Exception as e:
+            startup.error = f"{what}: {type(e).__name__}: {e}"
+            logger.warning("Warm-up of %s failed (%s), retrying in %.0fs", what, e, settings.backend_health_interval)
+            await asyncio.sleep(settings.backend_health_interval)
+
+
+async def _warm_backend(name: str, load: Callable[[str], Awaitable], url: str, first: asyncio.Event) -> None:
+    await _retry(f"{name} on {url}", lambda: load(url))
+    startup.warm[name].append(url)
+    first.set()
+
+
+async def _warm_pool(name: str, load: Callable[[str], Awaitable], pool: BackendPool, tasks: list) -> None:
+    """Start loading the model on every backend; return once the first one is warm."""
+    first = asyncio.Event()
+    startup.warm[name] = []
+    tasks.extend(asyncio.create_task(_warm_backend(name, load, b.url, first)) for b in pool.backends)
+    with startup.stage(name):
+        await first.wait()
+
+
+async def _timed(name: str, step: Awaitable) -> None:
+    with startup.stage(name):
+        await step
+
+
+async def warm_up(retriever) -> None:
+    """
+    Warm up models and the index, then mark the service ready.
+
+    Ready needs one warm backend per pool, not all of them: requests fail
+    over to the warm ones, and the rest keep loading in the background
+    (a dead host is warmed whenever it comes back).
+    """
+    if not settings.warmup_enabled:
+        startup.mark_ready()
+        return
+
+    tasks = []
+    try:
+        # Models load in parallel; the first retrieval needs the embedding model
+        steps = [
+            _warm_pool("chat_model", _load_chat_model, chat_pool, tasks),
+            _warm_pool("embedding_model", _load_embedding_model, embedding_pool, tasks),
+        ]
+        if retriever.reranker is not None:
+            steps.append(_timed("reranker", _retry("reranker", retriever.reranker.warm_up)))
+        await asyncio.gather(*steps)
+        await _timed("index", _retry("index", lambda: retriever.retrieve(settings.warmup_query)))
+
+        startup.mark_ready()
+        await asyncio.gather(*tasks)
+        startup.error = None
+    finally:
+        for task in tasks:
+            task.cancel()
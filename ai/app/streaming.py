@@ -0,0 +1,120 @@
+"""
+Token coalescing for SSE streams.
+
+Sending one SSE event per Ollama token costs an event frame, a JSON
+encode and a socket write per token, and makes the browser re-render
+per token. `coalesce()` groups tokens into batches instead: the first
+token is passed through immediately, later tokens are held for at most
+`sse_coalesce_ms` or until `sse_coalesce_bytes` have accumulated.
+"""
+
+import asyncio
+import time
+from typing import AsyncGenerator, AsyncIterator, List
+
+from app.config import settings
+
+# ----------------------------------------------------------------------
+
+_END = object()
+
+
+async def coalesce(
+    chunks: AsyncGenerator[str, None],
+    interval_ms: float = None,
+    max_bytes: int = None,
+) -> AsyncIterator[List[str]]:
+    """
+    Re-batch a token stream.
+
+    Yields:
+        Lists of consecutive tokens; the first list holds only the first token
+
+    A pump task reads `chunks` so tokens keep arriving while the caller is
+    busy writing the previous batch. Closing this generator cancels the
+    pump, which closes `chunks` (and with it the Ollama response).
+    """
+    interval = (settings.sse_coalesce_ms if interval_ms is None else interval_ms) / 1000
+    max_bytes = settings.sse_coalesce_bytes if max_bytes is None else max_bytes
+
+    if interval <= 0:
+        try:
+            async for chunk in chunks:
+                yield [chunk]
+        finally:
+            await chunks.aclose()
+        return
+
+    queue: asyncio.Queue = asyncio.Queue()
+    ready = asyncio.Event()
+
+    async def pump() -> None:
+        try:
+            async for chunk in chunks:
+                queue.put_nowait(chunk)
+                ready.set()
+        except Exception as e:
+            queue.put_nowait(e)
+        queue.put_nowait(_END)
+        ready.set()
+
+    async def wait_ready(timeout: float = None) -> bool:
+        """Wait until something is queued; False on timeout."""
+        # Waiting on the event rather than queue.get() means a timeout can
+        # never swallow an item
+        while queue.empty():
+            ready.clear()
+            try:
+                await asyncio.wait_for(ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    def take():
+        item = queue.get_nowait()
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    task = asyncio.create_task(pump())
+    try:
+        # First token goes out on its own, so time to first token is unchanged
+        await wait_ready()
+        item = take()
+        if item is _END:
+            return
+        yield [item]
+
+        while True:
+            await wait_ready()
+            item = take()
+            if item is _END:
+                return
+
+            batch = [item]
+            size = len(item.encode("utf-8"))
+            deadline = time.monotonic() + interval
+            tail = None  # _END or an exception, raised after flushing the batch
+
+            while size < max_bytes:
+                if not await wait_ready(max(0.0, deadline - time.monotonic())):
+                    break
+                item = queue.get_nowait()
+                if item is _END or isinstance(item, Exception):
+                    tail = item
+                    break
+                batch.append(item)
+                size += len(item.encode("utf-8"))
+
+            yield batch
+            if tail is _END:
+                return
+            if tail is not None:
+                raise tail
+    finally:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        await chunks.aclose()
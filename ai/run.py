@@ -9,5 +9,7 @@ if __name__ == "__main__":
         "app.main:app",
         host=settings.host,
         port=settings.port,
-        reload=True,
-    )
\ No newline at end of file
+        # Several workers share caches only with CACHE_BACKEND=sqlite
+        reload=settings.workers == 1,
+        workers=settings.workers,
+    )
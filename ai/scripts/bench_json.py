@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of per-token JSON cost on the chat streaming path.
+
+For every token, the service parses one Ollama NDJSON line and encodes
+one SSE payload. This replays a recorded-shape stream through the same
+calls `app.ollama` and `app.main` make and measures them in isolation:
+
+    baseline  text lines (as `aiter_lines()` yields them), json.loads/json.dumps
+    stdlib    app.jsonutil.iter_ndjson + dumps with the stdlib fallback
+    orjson    app.jsonutil.iter_ndjson + dumps with orjson (when installed)
+
+Usage:
+    python scripts/bench_json.py
+    python scripts/bench_json.py --tokens 5000 --repeat 7 --batch 4
+"""
+
+import sys
+import argparse
+import asyncio
+import importlib.util
+import json
+import time
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import jsonutil
+
+# ----------------------------------------------------------------------
+
+WORDS = (
+    "ЕСКИЗ е Единна система за кандидатстване и информационно обслужване на записването . "
+    "Регистрацията се извършва на eskis-can.mon.bg , като документите се подават онлайн ."
+).split()
+
+
+def make_chunks(n: int, chunk_bytes: int) -> list:
+    """An Ollama /api/chat NDJSON body of `n` tokens, split like network reads."""
+    lines = []
+    for i in range(n):
+        chunk = {
+            "model": "qwen3:8b",
+            "created_at": "2024-01-01T00:00:00.000000Z",
+            "message": {"role": "assistant", "content": " " + WORDS[i % len(WORDS)]},
+            "done": False,
+        }
+        lines.append(json.dumps(chunk).encode("utf-8"))
+    body = b"\n".join(lines) + b"\n"
+    return [body[i:i + chunk_bytes] for i in range(0, len(body), chunk_bytes)]
+
+
+async def _replay(chunks: list):
+    for chunk in chunks:
+        yield chunk
+
+
+async def baseline(chunks: list, batch: int) -> None:
+    """The old path: decode and split text lines, then stdlib json."""
+    parts = []
+    pending = ""
+    async for chunk in _replay(chunks):
+        *lines, pending = (pending + chunk.decode("utf-8")).split("\n")
+        for line in lines:
+            if line:
+                data = json.loads(line)
+                parts.append(data["message"]["content"])
+                if len(parts) == batch:
+                    json.dumps({"content": "".join(parts)})
+                    parts = []
+
+
+def make_path(module):
+    """The service path, using `module` in place of app.jsonutil."""
+    async def run(chunks: list, batch: int) -> None:
+        parts = []
+        async for data in module.iter_ndjson(_replay(chunks)):
+            content = data.get("message", {}).get("content")
+            if content:
+                parts.append(content)
+                if len(parts) == batch:
+                    module.dumps({"content": "".join(parts)})
+                    parts = []
+    return run
+
+
+def load_stdlib_jsonutil():
+    """A second copy of app.jsonutil, loaded with orjson hidden."""
+    saved = sys.modules.get("orjson")
+    sys.modules["orjson"] = None  # Makes `import orjson` raise ImportError
+    try:
+        spec = importlib.util.spec_from_file_location("jsonutil_stdlib", jsonutil.__file__)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        if saved is None:
+            del sys.modules["orjson"]
+        else:
+            sys.modules["orjson"] = saved
+    return module
+
+
+def measure(paths: dict, chunks: list, tokens: int, batch: int, repeat: int) -> dict:
+    """Best-of-`repeat` nanoseconds per token for each path, interleaving the runs."""
+    async def timed(func) -> int:
+        started = time.perf_counter_ns()
+        await func(chunks, batch)
+        return time.perf_counter_ns() - started
+
+    best = dict.fromkeys(paths, float("inf"))
+    for _ in range(repeat):
+        for name, func in paths.items():
+            best[name] = min(best[name], asyncio.run(timed(func)))
+    return {name: ns / tokens for name, ns in best.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-token JSON cost on the streaming path")
+    parser.add_argument("--tokens", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=9)
+    parser.add_argument("--batch", type=int, default=1, help="Tokens per SSE event (coalescing)")
+    parser.add_argument("--chunk-bytes", type=int, default=4096, help="Bytes per network read")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.tokens, args.chunk_bytes)
+    paths = {"baseline": baseline}
+    if jsonutil.BACKEND == "orjson":
+        paths["stdlib"] = make_path(load_stdlib_jsonutil())
+        paths["orjson"] = make_path(jsonutil)
+    else:
+        paths["stdlib"] = make_path(jsonutil)
+        print("orjson is not installed; `pip install orjson` to compare it\n")
+
+    results = measure(paths, chunks, args.tokens, args.batch, args.repeat)
+
+    print("=" * 60)
+    print(f"Per-token JSON cost ({args.tokens} tokens, {args.batch} token(s) per event)")
+    print(f"app.jsonutil backend: {jsonutil.BACKEND}")
+    print("=" * 60)
+    for name, ns in results.items():
+        print(f"{name:<10} {ns:>8.0f} ns/token   {results['baseline'] / ns:>5.2f}x")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({
+            "tokens": args.tokens,
+            "batch": args.batch,
+            "backend": jsonutil.BACKEND,
+            "ns_per_token": {name: round(ns, 1) for name, ns in results.items()},
+        }, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
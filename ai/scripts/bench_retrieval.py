@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Retrieval quality and latency benchmark.
+
+Runs a labeled query set through `Retriever.retrieve` over a grid of
+chunk sizes, retrieval modes, top_k values and similarity thresholds,
+and reports recall@k, MRR, context size and per-query latency.
+
+The query file is JSONL, one labeled query per line:
+
+    {"query": "Как се регистрирам?", "sources": ["eskiz_guide.pdf"]}
+
+`sources` are file names as stored in chunk metadata (see --list in
+ingest.py). The current chunk settings use the existing collection;
+other chunk sizes are indexed into temporary collections.
+
+Usage:
+    python scripts/bench_retrieval.py data/eval/queries.jsonl
+    python scripts/bench_retrieval.py queries.jsonl --chunk-sizes 500,1000,1500 --top-k 4,8,12
+    python scripts/bench_retrieval.py queries.jsonl --modes vector,hybrid --json results.json
+    python scripts/bench_retrieval.py queries.jsonl --modes hybrid,hybrid+rerank --top-k 3,4,6
+"""
+
+import sys
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.cachestore import MemoryCache
+from app.config import settings
+from app.rag.cache import EmbeddingCache
+from app.rag.chunker import TextChunker
+from app.rag.context import estimate_tokens
+from app.rag.lexical import BM25Index
+from app.rag.loader import DocumentLoader
+from app.rag.reranker import ScoreCache, create_reranker
+from app.rag.retriever import Retriever
+from app.rag.vectorstore import create_vectorstore
+from app.rag.versions import IndexPointer
+
+# ----------------------------------------------------------------------
+
+
+def parse_list(value: str, cast) -> list:
+    return [cast(v) for v in value.split(",") if v.strip()]
+
+
+def load_queries(path: str) -> list:
+    """Read labeled queries from a JSONL file."""
+    queries = []
+    for line_no, line in enumerate(Path(path).read_text(encoding="utf-8").splitlines(), 1):
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        if not item.get("query") or not item.get("sources"):
+            raise ValueError(f"{path}:{line_no}: expected 'query' and 'sources'")
+        queries.append(item)
+    return queries
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def latency_summary(values: list) -> dict:
+    """Milliseconds, rounded for readable JSON."""
+    return {
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "mean_ms": round(statistics.fmean(values) * 1000, 2) if values else 0.0,
+    }
+
+
+def score_results(results: list, expected: set, top_k: int) -> dict:
+    """recall@k over expected sources and reciprocal rank of the first hit."""
+    ranked_sources = [r["metadata"].get("source") for r in results[:top_k]]
+    found = expected.intersection(ranked_sources)
+    first_hit = next((i for i, s in enumerate(ranked_sources, 1) if s in expected), None)
+    return {
+        "recall": len(found) / len(expected),
+        "reciprocal_rank": 1 / first_hit if first_hit else 0.0,
+        "hit": first_hit is not None,
+    }
+
+
+# ----------------------------------------------------------------------
+# Indexes
+# ----------------------------------------------------------------------
+
+
+def build_index(documents: list, chunk_size: int, chunk_overlap: int, workdir: Path) -> tuple:
+    """Index the documents into a temporary collection and BM25 index."""
+    chunks = TextChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap).split_documents(documents)
+
+    name = f"bench_{chunk_size}_{chunk_overlap}"
+    vectorstore = create_vectorstore(persist_dir=str(workdir / "index"), collection_name=name)
+    vectorstore.add_documents(chunks)
+
+    lexical = BM25Index(path=str(workdir / f"{name}_bm25.json"))
+    lexical.add_documents(chunks)
+    lexical.save()
+
+    return vectorstore, lexical, len(chunks)
+
+
+def open_default_index() -> tuple:
+    live = IndexPointer.current()
+    vectorstore = live.open()
+    lexical = BM25Index.load(live.bm25_index_path)
+    return vectorstore, lexical, vectorstore.count()
+
+
+# ----------------------------------------------------------------------
+# Benchmark
+# ----------------------------------------------------------------------
+
+
+async def embed_queries(vectorstore, queries: list) -> dict:
+    """
+    Embed every query once, uncached, and prime a private cache so that
+    retrieval latency below measures search only.
+    """
+    function = vectorstore.embedding_function
+    cache = EmbeddingCache(backend=MemoryCache())
+    latencies = {}
+
+    for item in queries:
+        started = time.perf_counter()
+        embedding = await function.generator.embed_text(item["query"])
+        latencies[item["query"]] = time.perf_counter() - started
+        cache.set(function._model, item["query"], embedding)
+
+    function.cache = cache
+    return latencies
+
+
+async def bench_index(vectorstore, lexical, queries: list, args) -> list:
+    """Run all mode/top_k/threshold combinations against one index."""
+    embed_latency = await embed_queries(vectorstore, queries)
+    runs = []
+
+    reranker = None
+    for mode in args.modes:
+        retriever = Retriever(vectorstore=vectorstore, hybrid=mode.startswith("hybrid"), lexical=lexical)
+        retriever.reranker = None
+        if mode.endswith("+rerank"):
+            reranker = reranker or create_reranker(settings.rerank_backend)
+            if reranker is None:
+                raise SystemExit(f"Reranker backend {settings.rerank_backend!r} is not available")
+            retriever.reranker = reranker
+
+        for threshold in args.thresholds:
+            retriever.similarity_threshold = threshold
+
+            for top_k in args.top_k:
+                if reranker is not None:
+                    reranker.cache = ScoreCache(backend=MemoryCache())  # Time scoring, not cache hits
+                per_query = []
+                for item in queries:
+                    started = time.perf_counter()
+                    results = await retriever.retrieve(item["query"], top_k=top_k)
+                    search_latency = time.perf_counter() - started
+
+                    context = retriever.format_context(results)
+                    per_query.append({
+                        "query": item["query"],
+                        **score_results(results, set(item["sources"]), top_k),
+                        "results": len(results),
+                        "context_tokens": estimate_tokens(context),
+                        "embed_seconds": round(embed_latency[item["query"]], 4),
+                        "search_seconds": round(search_latency, 4),
+                    })
+
+                run = {
+                    "mode": mode,
+                    "top_k": top_k,
+                    "similarity_threshold": threshold,
+                    "recall_at_k": round(statistics.fmean(q["recall"] for q in per_query), 4),
+                    "mrr": round(statistics.fmean(q["reciprocal_rank"] for q in per_query), 4),
+                    "hit_rate": round(sum(q["hit"] for q in per_query) / len(per_query), 4),
+                    "avg_results": round(statistics.fmean(q["results"] for q in per_query), 2),
+                    "avg_context_tokens": round(statistics.fmean(q["context_tokens"] for q in per_query), 1),
+                    "embed_latency": latency_summary(list(embed_latency.values())),
+                    "search_latency": latency_summary([q["search_seconds"] for q in per_query]),
+                }
+                if args.per_query:
+                    run["queries"] = per_query
+                runs.append(run)
+
+    return runs
+
+
+async def run_benchmark(args) -> dict:
+    queries = load_queries(args.queries)
+    print(f"Loaded {len(queries)} labeled queries")
+
+    documents = None
+    report = {
+        "queries": len(queries),
+        "embedding_model": settings.embedding_model,
+        "indexes": [],
+    }
+
+    with tempfile.TemporaryDirectory(prefix="bench_retrieval_") as tmp:
+        for chunk_size in args.chunk_sizes:
+            chunk_overlap = min(args.chunk_overlap, chunk_size // 2)
+            print(f"\n=== chunk_size={chunk_size} chunk_overlap={chunk_overlap} ===")
+
+            is_default = (chunk_size, chunk_overlap) == (settings.chunk_size, settings.chunk_overlap)
+            started = time.perf_counter()
+            if is_default and not args.rebuild:
+                vectorstore, lexical, n_chunks = open_default_index()
+            else:
+                if documents is None:
+                    documents = DocumentLoader().load_directory()
+                vectorstore, lexical, n_chunks = build_index(documents, chunk_size, chunk_overlap, Path(tmp))
+            index_seconds = time.perf_counter() - started
+
+            runs = await bench_index(vectorstore, lexical, queries, args)
+            report["indexes"].append({
+                "chunk_size": chunk_size,
+                "chunk_overlap": chunk_overlap,
+                "chunks": n_chunks,
+                "existing_collection": is_default and not args.rebuild,
+                "index_seconds": round(index_seconds, 2),
+                "runs": runs,
+            })
+
+    return report
+
+
+def print_report(report: dict) -> None:
+    print("\n" + "=" * 102)
+    print("Retrieval Benchmark")
+    print("=" * 102)
+    print(f"{'chunk':>6} {'mode':<13} {'k':>3} {'thr':>5} {'recall':>7} {'mrr':>6} {'hit':>6} "
+          f"{'ctx tok':>8} {'embed p50':>10} {'search p50':>11} {'search p95':>11}")
+    for index in report["indexes"]:
+        for run in index["runs"]:
+            print(
+                f"{index['chunk_size']:>6} {run['mode']:<13} {run['top_k']:>3} {run['similarity_threshold']:>5} "
+                f"{run['recall_at_k']:>7.3f} {run['mrr']:>6.3f} {run['hit_rate']:>6.3f} "
+                f"{run['avg_context_tokens']:>8.0f} {run['embed_latency']['p50_ms']:>8.1f}ms "
+                f"{run['search_latency']['p50_ms']:>9.1f}ms {run['search_latency']['p95_ms']:>9.1f}ms"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval quality and latency")
+    parser.add_argument("queries", help="JSONL file with 'query' and 'sources' per line")
+    parser.add_argument("--chunk-sizes", type=lambda v: parse_list(v, int), default=[settings.chunk_size])
+    parser.add_argument("--chunk-overlap", type=int, default=settings.chunk_overlap,
+                        help="Overlap for every chunk size (capped at half the size)")
+    parser.add_argument("--top-k", type=lambda v: parse_list(v, int), default=[4, settings.top_k_results, 12])
+    parser.add_argument("--thresholds", type=lambda v: parse_list(v, float), default=[settings.similarity_threshold])
+    parser.add_argument("--modes", type=lambda v: parse_list(v, str), default=["vector", "hybrid"])
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Index the default chunk size into a temporary collection too")
+    parser.add_argument("--per-query", action="store_true", help="Include per-query results in the JSON")
+    parser.add_argument("--json", help="Write the report to this file")
+
+    args = parser.parse_args()
+    unknown = set(args.modes) - {"vector", "hybrid", "vector+rerank", "hybrid+rerank"}
+    if unknown:
+        parser.error(f"Unknown modes: {', '.join(sorted(unknown))}")
+
+    report = asyncio.run(run_benchmark(args))
+    print_report(report)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\nReport written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the AI service.
+
+Starts the server in a fresh process, polls /health, and reports how long
+it took to accept connections and to become ready, together with the
+per-step breakdown the server measured (imports, index, model warm-up).
+With --importtime it also lists the packages that cost most to import.
+
+Usage:
+    python scripts/bench_startup.py
+    python scripts/bench_startup.py --runs 5 --json startup.json
+    python scripts/bench_startup.py --importtime 15
+
+Pair with `scripts/fake_ollama.py --load-time 3` to try it without a model.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+# ----------------------------------------------------------------------
+
+AI_DIR = Path(__file__).parent.parent
+
+
+def measure_once(port: int, timeout: float) -> dict:
+    """Start uvicorn, wait until /health returns 200, then stop it."""
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=AI_DIR,
+    )
+    url = f"http://127.0.0.1:{port}/health"
+    listening = None
+
+    try:
+        with httpx.Client(timeout=2.0) as client:
+            while time.perf_counter() - started < timeout:
+                if server.poll() is not None:
+                    raise RuntimeError(f"Server exited with code {server.returncode}")
+                try:
+                    response = client.get(url)
+                except httpx.TransportError:
+                    time.sleep(0.05)
+                    continue
+
+                if listening is None:
+                    listening = time.perf_counter() - started
+                if response.status_code == 200:
+                    return {
+                        "listening_seconds": round(listening, 3),
+                        "ready_seconds": round(time.perf_counter() - started, 3),
+                        "stages_ms": response.json()["startup"]["stages_ms"],
+                    }
+                time.sleep(0.05)
+        raise TimeoutError(f"Not ready after {timeout:.0f}s")
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def slowest_imports(limit: int) -> list:
+    """(package, ms) for the packages that cost most to import with app.main."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=AI_DIR,
+        capture_output=True,
+        text=True,
+    )
+    packages = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, _, module = line[len("import time:"):].split("|")
+        package = module.strip().split(".")[0]
+        packages[package] = packages.get(package, 0.0) + int(own) / 1000
+    return sorted(packages.items(), key=lambda item: -item[1])[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure AI service cold start")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=300.0, help="Seconds to wait for readiness")
+    parser.add_argument("--importtime", type=int, default=0, metavar="N", help="Also list the N slowest packages to import")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    runs = []
+    for i in range(args.runs):
+        print(f"Run {i + 1}/{args.runs}...")
+        runs.append(measure_once(args.port, args.timeout))
+
+    # Models stay loaded (keep_alive) after the first run, so run 1 is the cold one
+    print("\n" + "=" * 72)
+    print("Startup benchmark")
+    print("=" * 72)
+    stages = list(dict.fromkeys(name for run in runs for name in run["stages_ms"]))
+    print(f"{'run':>4} {'listen s':>9} {'ready s':>8}  " + " ".join(f"{name[:12]:>12}" for name in stages))
+    for i, run in enumerate(runs, 1):
+        print(
+            f"{i:>4} {run['listening_seconds']:>9.2f} {run['ready_seconds']:>8.2f}  "
+            + " ".join(f"{run['stages_ms'].get(name, 0):>10.0f}ms" for name in stages)
+        )
+    if len(runs) > 1:
+        print(f"\nMedian ready: {statistics.median(r['ready_seconds'] for r in runs):.2f}s")
+
+    report = {"runs": runs}
+    if args.importtime:
+        report["slowest_imports_ms"] = slowest_imports(args.importtime)
+        print("\nSlowest packages imported by app.main:")
+        for module, ms in report["slowest_imports_ms"]:
+            print(f"  {ms:>8.1f} ms  {module}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\nReport written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Vector store backend benchmark: ChromaDB vs the in-process NumPy index.
+
+Indexes synthetic normalized embeddings into temporary stores and
+measures single-query latency, batched query throughput and recall@k
+against exact search. No Ollama server is needed.
+
+Usage:
+    python scripts/bench_vectorstore.py
+    python scripts/bench_vectorstore.py --chunks 5000 --dim 768 --queries 200 --top-k 8
+    python scripts/bench_vectorstore.py --backends numpy-float32,numpy-int8 --json vectors.json
+"""
+
+import sys
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from langchain.schema import Document
+
+from app.rag.numpy_store import NumpyVectorStore
+from app.rag.vectorstore import VectorStore
+
+# ----------------------------------------------------------------------
+
+BACKENDS = ("chroma", "numpy-float32", "numpy-float16", "numpy-int8")
+
+
+def make_data(chunks: int, dim: int, queries: int, seed: int = 0) -> tuple:
+    """Clustered unit vectors, so neighbours are meaningful, plus nearby queries."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, chunks // 50), dim))
+    vectors = centers[rng.integers(len(centers), size=chunks)] + 0.5 * rng.normal(size=(chunks, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    picks = vectors[rng.integers(chunks, size=queries)] + 0.3 * rng.normal(size=(queries, dim)) / np.sqrt(dim)
+    picks /= np.linalg.norm(picks, axis=1, keepdims=True)
+    return vectors.astype(np.float32), picks.astype(np.float32)
+
+
+def open_store(backend: str, workdir: str):
+    if backend == "chroma":
+        return VectorStore(persist_dir=workdir, collection_name="bench")
+    return NumpyVectorStore(persist_dir=workdir, collection_name="bench", dtype=backend.split("-", 1)[1])
+
+
+def bench_backend(backend: str, vectors: np.ndarray, queries: np.ndarray, top_k: int, batch: int) -> dict:
+    documents = [
+        Document(page_content=f"chunk {i}", metadata={"chunk_id": f"c{i}", "source": f"doc{i % 20}.pdf"})
+        for i in range(len(vectors))
+    ]
+
+    with tempfile.TemporaryDirectory(prefix="bench_vectorstore_") as tmp:
+        store = open_store(backend, tmp)
+
+        started = time.perf_counter()
+        for i in range(0, len(documents), 1000):
+            store.add_embedded(documents[i:i + 1000], vectors[i:i + 1000].tolist())
+        store.mark_updated()
+        build_seconds = time.perf_counter() - started
+
+        query_list = queries.tolist()
+        store.query_embeddings(query_list[:1], top_k)  # warm up
+
+        latencies = []
+        results = []
+        for query in query_list:
+            started = time.perf_counter()
+            results.extend(store.query_embeddings([query], top_k))
+            latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for i in range(0, len(query_list), batch):
+            store.query_embeddings(query_list[i:i + batch], top_k)
+        batch_seconds = time.perf_counter() - started
+
+        stats = store.get_stats()
+
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :top_k]
+    recall = statistics.fmean(
+        len({f"c{i}" for i in truth} & {r["id"] for r in found}) / top_k
+        for truth, found in zip(exact.tolist(), results)
+    )
+
+    ordered = sorted(latencies)
+    return {
+        "backend": backend,
+        "build_seconds": round(build_seconds, 3),
+        "query_p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+        "query_p95_ms": round(ordered[int(len(ordered) * 0.95)] * 1000, 3),
+        "batch_queries_per_sec": round(len(query_list) / batch_seconds, 1),
+        f"recall_at_{top_k}": round(recall, 4),
+        "vector_bytes": stats.get("vector_bytes"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vector store backends")
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=32, help="Queries per batched call")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    unknown = set(backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f"Unknown backends: {', '.join(sorted(unknown))}")
+
+    vectors, queries = make_data(args.chunks, args.dim, args.queries)
+    results = []
+    for backend in backends:
+        print(f"Benchmarking {backend}...")
+        results.append(bench_backend(backend, vectors, queries, args.top_k, args.batch))
+
+    print("\n" + "=" * 88)
+    print(f"Vector store benchmark: {args.chunks} chunks x {args.dim} dims, {args.queries} queries, top_k={args.top_k}")
+    print("=" * 88)
+    print(f"{'backend':<15} {'build s':>8} {'p50 ms':>8} {'p95 ms':>8} {'batch q/s':>10} {'recall':>7} {'vector MB':>10}")
+    for r in results:
+        size = f"{r['vector_bytes'] / 1e6:.1f}" if r["vector_bytes"] else "-"
+        print(
+            f"{r['backend']:<15} {r['build_seconds']:>8} {r['query_p50_ms']:>8} {r['query_p95_ms']:>8} "
+            f"{r['batch_queries_per_sec']:>10} {r[f'recall_at_{args.top_k}']:>7} {size:>10}"
+        )
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"config": vars(args), "results": results}, indent=2), encoding="utf-8")
+        print(f"\nReport written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Stand-in Ollama server for benchmarks and local testing.
+
+Implements the parts of the Ollama API the AI service uses, with
+configurable latency and no model:
+
+    POST /api/chat         NDJSON token stream (or a single response)
+    POST /api/embeddings   Deterministic vector for one prompt
+    POST /api/embed        Deterministic vectors for one or more inputs
+    POST /api/generate     Model load / keep-alive requests
+    GET  /api/version, /api/tags
+
+Usage:
+    python scripts/fake_ollama.py                             # :11434, 50 tok/s
+    python scripts/fake_ollama.py --port 11501 --tokens-per-sec 20 --ttft 0.5
+    python scripts/fake_ollama.py --embed-latency 0.02 --dim 768
+    python scripts/fake_ollama.py --load-time 3       # first request per model is slow
+
+Run several on different ports to try OLLAMA_HOSTS failover locally.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# ----------------------------------------------------------------------
+
+WORDS = (
+    "ЕСКИЗ е Единна система за кандидатстване и информационно обслужване на записването . "
+    "Регистрацията се извършва на eskis-can.mon.bg , като документите се подават онлайн ."
+).split()
+
+config = argparse.Namespace(
+    tokens=200,
+    tokens_per_sec=50.0,
+    ttft=0.2,
+    embed_latency=0.01,
+    embed_item_latency=0.002,
+    dim=768,
+    fail_rate=0.0,
+    load_time=0.0,
+)
+
+# Models "loaded" so far; the first request for a model pays --load-time
+loaded = set()
+
+app = FastAPI(title="Fake Ollama")
+
+
+def embed(text: str, dim: int) -> list:
+    """Unit vector seeded by the text, identical across runs and hosts."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+def _answer_tokens(n: int) -> list:
+    return [(" " if i else "") + WORDS[i % len(WORDS)] for i in range(n)]
+
+
+def _chunk(model: str, content: str, done: bool = False) -> dict:
+    return {
+        "model": model,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "message": {"role": "assistant", "content": content},
+        "done": done,
+    }
+
+
+async def _load(model: str) -> None:
+    if model not in loaded:
+        await asyncio.sleep(config.load_time)
+        loaded.add(model)
+
+
+def _injected_failure():
+    """An HTTP 500 for a `--fail-rate` share of requests, else None."""
+    if config.fail_rate and random.random() < config.fail_rate:
+        return JSONResponse({"error": "injected failure"}, status_code=500)
+    return None
+
+
+@app.get("/api/version")
+async def version():
+    return {"version": "0.0.0-fake"}
+
+
+@app.get("/api/tags")
+async def tags():
+    return {"models": []}
+
+
+@app.post("/api/generate")
+async def generate(request: Request):
+    body = await request.json()
+    return {"model": body.get("model", ""), "response": "", "done": True}
+
+
+@app.post("/api/chat")
+async def chat(request: Request):
+    if failure := _injected_failure():
+        return failure
+    body = await request.json()
+    model = body.get("model", "fake")
+    await _load(model)
+    if not body.get("messages"):
+        # Empty messages only load the model, like Ollama
+        return {**_chunk(model, "", done=True), "done_reason": "load"}
+
+    limit = body.get("options", {}).get("num_predict") or config.tokens
+    tokens = _answer_tokens(min(config.tokens, limit))
+
+    if not body.get("stream", True):
+        await asyncio.sleep(config.ttft + len(tokens) / config.tokens_per_sec)
+        return _chunk(model, "".join(tokens), done=True)
+
+    async def stream():
+        await asyncio.sleep(config.ttft)
+        interval = 1.0 / config.tokens_per_sec
+        next_at = time.monotonic()
+        for token in tokens:
+            yield json.dumps(_chunk(model, token), ensure_ascii=False) + "\n"
+            next_at += interval
+            await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+        yield json.dumps(_chunk(model, "", done=True)) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.post("/api/embeddings")
+async def embeddings(request: Request):
+    if failure := _injected_failure():
+        return failure
+    body = await request.json()
+    await _load(body.get("model", ""))
+    await asyncio.sleep(config.embed_latency + config.embed_item_latency)
+    return {"embedding": embed(body.get("prompt", ""), config.dim)}
+
+
+@app.post("/api/embed")
+async def embed_batch(request: Request):
+    if failure := _injected_failure():
+        return failure
+    body = await request.json()
+    await _load(body.get("model", ""))
+    inputs = body.get("input", "")
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    await asyncio.sleep(config.embed_latency + config.embed_item_latency * len(inputs))
+    return {"model": body.get("model", ""), "embeddings": [embed(text, config.dim) for text in inputs]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--tokens", type=int, default=config.tokens, help="Tokens per answer")
+    parser.add_argument("--tokens-per-sec", type=float, default=config.tokens_per_sec)
+    parser.add_argument("--ttft", type=float, default=config.ttft, help="Seconds before the first token")
+    parser.add_argument("--embed-latency", type=float, default=config.embed_latency, help="Seconds per embedding request")
+    parser.add_argument("--embed-item-latency", type=float, default=config.embed_item_latency, help="Extra seconds per embedded text")
+    parser.add_argument("--dim", type=int, default=config.dim, help="Embedding dimension")
+    parser.add_argument("--fail-rate", type=float, default=config.fail_rate, help="Fraction of requests answered with HTTP 500")
+    parser.add_argument("--load-time", type=float, default=config.load_time, help="Seconds the first request per model waits")
+
+    args = parser.parse_args()
+    for key, value in vars(args).items():
+        setattr(config, key, value)
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,21 @@
 """
 Document ingestion script for RAG.
 
+Ingestion is incremental: files whose content hash matches the manifest
+are skipped, only new or changed chunks are embedded, and chunks of
+removed files are deleted.
+
+Each run builds a new index version: the live collection is copied
+(embeddings included) into a fresh one, the changes are applied there,
+and the new version is published through the index pointer. A running
+AI service switches over without a restart. The service never deletes a
+version; this script does, after publishing, keeping the newest
+`index_keep_versions` so workers that have not switched yet can finish.
+
 Usage:
-    python scripts/ingest.py                    # Ingest all documents
-    python scripts/ingest.py --reset            # Reset and re-ingest
+    python scripts/ingest.py                    # Ingest new/changed documents
+    python scripts/ingest.py --reset            # Reset and re-ingest everything
+    python scripts/ingest.py --parallel         # Pipelined, multi-process ingestion
     python scripts/ingest.py --stats            # Show collection stats
     python scripts/ingest.py --list             # List indexed documents
 """
@@ -16,15 +28,19 @@ from pathlib import Path
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from app.config import settings
 from app.rag.loader import DocumentLoader
 from app.rag.chunker import TextChunker
-from app.rag.vectorstore import VectorStore
+from app.rag.lexical import BM25Index
+from app.rag.manifest import IngestManifest, file_hash
+from app.rag.pipeline import IngestPipeline
+from app.rag.versions import IndexPointer, new_version, prune_versions
 
 # ----------------------------------------------------------------------
 
 
-def ingest_documents(reset: bool = False) -> None:
-    """Load, chunk, and index all documents."""
+def ingest_documents(reset: bool = False, parallel: bool = False, workers: int = None) -> None:
+    """Load, chunk, and index new or changed documents."""
     print("=" * 60)
     print("Document Ingestion Pipeline")
     print("=" * 60)
@@ -32,33 +48,99 @@ def ingest_documents(reset: bool = False) -> None:
     # Initialize components
     loader = DocumentLoader()
     chunker = TextChunker()
-    vectorstore = VectorStore()
-
-    # Reset collection if requested
+    live = IndexPointer.current()
+    vectorstore = live.open()
+    manifest = IngestManifest.load()
+    lexical = BM25Index.load(live.bm25_index_path)
+
+    # Without a manifest we cannot tell which chunks are ours (e.g. a
+    # collection from before incremental ingestion), so rebuild it
+    if not reset and not manifest.files and vectorstore.count() > 0:
+        print("\nNo ingest manifest found for a non-empty collection, rebuilding")
+        reset = True
+
+    # Reset: start the new version empty (the live one stays until the swap)
     if reset:
         print("\nResetting collection...")
-        try:
-            vectorstore.delete_collection()
-            vectorstore = VectorStore()  # Recreate
-        except Exception as e:
-            print(f"Note: {e}")
-
-    # Load documents
-    print("\n[1/3] Loading documents...")
-    documents = loader.load_directory()
-
-    if not documents:
+        manifest.clear()
+        lexical.clear()
+    elif manifest.files and vectorstore.count() == 0:
+        print("\nCollection is empty, ignoring stale manifest")
+        manifest.clear()
+        lexical.clear()
+    elif manifest.files and not len(lexical):
+        print("\nBuilding lexical index from the existing collection...")
+        for doc_id, content, metadata in vectorstore.get_documents():
+            lexical.add(doc_id, content, metadata)
+
+    # Compare files against the manifest
+    print("\n[1/3] Checking documents...")
+    files = {f.name: f for f in loader.get_supported_files()}
+
+    removed = sorted(set(manifest.files) - set(files))
+    removed_ids = []
+    for source in removed:
+        print(f"Removed: {source}")
+        removed_ids.extend(manifest.remove_file(source))
+
+    changed = []
+    for source, file_path in sorted(files.items()):
+        current_hash = file_hash(file_path)
+        if manifest.file_hash(source) == current_hash:
+            continue
+        print(f"{'Changed' if source in manifest.files else 'New'}: {source}")
+        changed.append((source, file_path, current_hash))
+
+    print(f"  -> {len(changed)} new/changed, {len(files) - len(changed)} unchanged, {len(removed)} removed")
+
+    if not files and not removed:
         print("\nNo documents found. Add documents to:")
         print(f"  {loader.documents_dir}")
         return
 
-    # Chunk documents
-    print("\n[2/3] Chunking documents...")
-    chunks = chunker.split_documents(documents)
+    if not changed and not removed and not reset:
+        print("\nIndex is up to date")
+        return
 
-    # Index chunks
-    print("\n[3/3] Indexing chunks...")
-    vectorstore.add_documents(chunks)
+    # Build the new version next to the live one
+    target = IndexPointer.for_version(new_version())
+    live_store, vectorstore = vectorstore, target.open()
+    lexical.path = Path(target.bm25_index_path)
+    if not reset:
+        print(f"\nCopying {live_store.count()} chunks from '{live.collection}'...")
+        live_store.copy_to(vectorstore)
+
+    try:
+        ok = _apply_changes(
+            loader, chunker, vectorstore, manifest, lexical, changed, removed_ids, parallel, workers
+        )
+    except BaseException:
+        target.destroy()
+        raise
+    if not ok:
+        target.destroy()
+        print("\nIngestion finished with errors; index not published, re-run to retry.")
+        return
+
+    # Publish: BM25 file first, then the pointer swap, then the manifest
+    lexical.save()
+    vectorstore.mark_updated()
+    target.publish()
+    manifest.save()
+    print(f"\nPublished index version {target.version}")
+
+    # Keep recent versions for workers that have not switched yet; drop older ones
+    try:
+        pruned = prune_versions(
+            keep={live.collection, target.collection},
+            keep_latest=settings.index_keep_versions,
+        )
+    except Exception as e:
+        # The new version is already live; pruning is retried on the next run
+        print(f"Could not delete old index versions: {e}")
+    else:
+        if pruned:
+            print(f"Deleted {len(pruned)} old index version(s)")
 
     # Show stats
     print("\n" + "=" * 60)
@@ -69,9 +151,61 @@ def ingest_documents(reset: bool = False) -> None:
     print(f"Total chunks indexed: {stats['document_count']}")
 
 
+def _apply_changes(loader, chunker, vectorstore, manifest, lexical, changed, removed_ids, parallel, workers) -> bool:
+    """Apply new, changed and removed files to the new version; False on errors."""
+    if parallel:
+        # Delete chunks of removed files, then stream changed files through
+        # the parse -> embed -> upsert pipeline
+        vectorstore.delete_ids(removed_ids)
+        lexical.remove_ids(removed_ids)
+
+        print("\n[2/2] Parsing, embedding and indexing in parallel...")
+        pipeline = IngestPipeline(vectorstore, manifest, lexical, parse_workers=workers)
+        ok = pipeline.run(changed)
+
+        print("\nStage throughput:")
+        print(pipeline.report())
+
+        return ok
+
+    _ingest_sequential(loader, chunker, vectorstore, manifest, lexical, changed, removed_ids)
+    return True
+
+
+def _ingest_sequential(loader, chunker, vectorstore, manifest, lexical, changed, removed_ids) -> None:
+    """Chunk changed documents, diff chunk IDs, then index in one pass."""
+    print("\n[2/3] Chunking changed documents...")
+    to_embed = []
+    to_update = []
+    stale_ids = list(removed_ids)
+
+    for source, file_path, current_hash in changed:
+        print(f"Loading: {source}")
+        chunks = chunker.split_documents(loader.load_file(file_path))
+        if not chunks:
+            print("  -> No content, keeping previously indexed chunks")
+            continue
+
+        embed, unchanged, stale = manifest.apply(source, current_hash, chunks)
+        to_embed.extend(embed)
+        to_update.extend(unchanged)
+        stale_ids.extend(stale)
+
+    # Index chunks
+    print("\n[3/3] Indexing chunks...")
+    print(f"  -> {len(to_embed)} to embed, {len(to_update)} unchanged, {len(stale_ids)} to delete")
+    vectorstore.add_documents(to_embed)
+    vectorstore.update_metadata(to_update)
+    vectorstore.delete_ids(stale_ids)
+
+    # Keep the BM25 index in step with the collection
+    lexical.remove_ids(stale_ids)
+    lexical.add_documents(to_embed + to_update)
+
+
 def show_stats() -> None:
     """Show collection statistics."""
-    vectorstore = VectorStore()
+    vectorstore = IndexPointer.current().open()
     stats = vectorstore.get_stats()
 
     print("Collection Statistics")
@@ -83,7 +217,7 @@ def show_stats() -> None:
 
 def list_documents() -> None:
     """List all indexed documents."""
-    vectorstore = VectorStore()
+    vectorstore = IndexPointer.current().open()
     sources = vectorstore.list_documents()
 
     print("Indexed Documents")
@@ -97,7 +231,9 @@ def list_documents() -> None:
 
 def main():
     parser = argparse.ArgumentParser(description="Document ingestion for RAG")
-    parser.add_argument("--reset", action="store_true", help="Reset collection before ingesting")
+    parser.add_argument("--reset", action="store_true", help="Reset collection and manifest before ingesting")
+    parser.add_argument("--parallel", action="store_true", help="Use the pipelined multi-process ingestion")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes for --parallel")
     parser.add_argument("--stats", action="store_true", help="Show collection statistics")
     parser.add_argument("--list", action="store_true", help="List indexed documents")
 
@@ -108,7 +244,7 @@ def main():
     elif args.list:
         list_documents()
     else:
-        ingest_documents(reset=args.reset)
+        ingest_documents(reset=args.reset, parallel=args.parallel, workers=args.workers)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Load generator for the /chat SSE endpoint.
+
+Sends chat requests at a fixed concurrency and reports time to first
+token, end-to-end latency, streaming throughput and error rates.
+
+Usage:
+    python scripts/loadtest.py --concurrency 20 --requests 200
+    python scripts/loadtest.py --url http://localhost:8000/chat --vary --json results.json
+    python scripts/loadtest.py --questions-file data/questions.txt
+
+Pair with scripts/fake_ollama.py to benchmark the service without a model.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+# ----------------------------------------------------------------------
+
+DEFAULT_QUESTION = "Как се регистрирам в ЕСКИЗ?"
+
+
+def percentile(values: list, q: float) -> float:
+    """Nearest-rank percentile (0 for no values)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def summarize(values: list) -> dict:
+    return {
+        "p50": round(percentile(values, 50), 4),
+        "p95": round(percentile(values, 95), 4),
+        "p99": round(percentile(values, 99), 4),
+        "mean": round(statistics.fmean(values), 4) if values else 0.0,
+        "max": round(max(values), 4) if values else 0.0,
+    }
+
+
+async def run_one(client: httpx.AsyncClient, url: str, question: str) -> dict:
+    """Send one chat request and time its SSE stream."""
+    result = {"ok": False, "ttft": None, "latency": None, "events": 0, "chars": 0, "error": None}
+    started = time.perf_counter()
+    event = None
+
+    try:
+        async with client.stream(
+            "POST",
+            url,
+            json={"messages": [{"role": "user", "content": question}], "bypass_cache": False},
+        ) as response:
+            if response.status_code != 200:
+                result["error"] = f"HTTP {response.status_code}"
+                return result
+
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:"):
+                    data = json.loads(line[5:].strip() or "{}")
+                    if event == "message":
+                        if result["ttft"] is None:
+                            result["ttft"] = time.perf_counter() - started
+                        result["events"] += 1
+                        result["chars"] += len(data.get("content", ""))
+                    elif event == "done":
+                        result["ok"] = True
+                        result["done"] = data
+                    elif event == "error":
+                        result["error"] = data.get("error", "error event")
+    except (httpx.HTTPError, json.JSONDecodeError) as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+
+    result["latency"] = time.perf_counter() - started
+    return result
+
+
+async def run_load(args) -> dict:
+    if args.questions_file:
+        questions = [q.strip() for q in Path(args.questions_file).read_text(encoding="utf-8").splitlines() if q.strip()]
+    else:
+        questions = [args.question]
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(args.requests):
+        question = questions[i % len(questions)]
+        # Defeat answer/embedding caches when measuring the full path
+        queue.put_nowait(f"{question} ({i})" if args.vary else question)
+
+    results = []
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        async def worker():
+            while True:
+                try:
+                    question = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                results.append(await run_one(client, args.url, question))
+                done = len(results)
+                if done % max(1, args.requests // 10) == 0:
+                    print(f"  {done}/{args.requests} requests done", file=sys.stderr)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        wall = time.perf_counter() - started
+
+    ok = [r for r in results if r["ok"]]
+    errors = {}
+    for r in results:
+        if not r["ok"]:
+            errors[r["error"] or "incomplete stream"] = errors.get(r["error"] or "incomplete stream", 0) + 1
+
+    # Prefer the server's own rate from the done event; fall back to
+    # message events per second as seen by the client
+    stream_rates = [
+        r["done"]["tokens_per_second"] if "tokens_per_second" in r.get("done", {})
+        else r["events"] / (r["latency"] - r["ttft"])
+        for r in ok if r["ttft"] is not None and r["latency"] > r["ttft"]
+    ]
+
+    # Per-stage timings reported by the server in the done event
+    stages = {}
+    for r in ok:
+        for stage, ms in r.get("done", {}).get("timings", {}).items():
+            stages.setdefault(stage, []).append(ms / 1000)
+
+    return {
+        "config": {
+            "url": args.url,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "vary": args.vary,
+        },
+        "wall_seconds": round(wall, 3),
+        "requests_per_sec": round(len(results) / wall, 3) if wall else 0.0,
+        "success": len(ok),
+        "error_rate": round(1 - len(ok) / len(results), 4) if results else 0.0,
+        "errors": errors,
+        "ttft_seconds": summarize([r["ttft"] for r in ok if r["ttft"] is not None]),
+        "latency_seconds": summarize([r["latency"] for r in ok]),
+        "tokens_per_sec_per_stream": summarize(stream_rates),
+        "server_stage_seconds": {stage: summarize(values) for stage, values in sorted(stages.items())},
+        "aggregate_events_per_sec": round(sum(r["events"] for r in ok) / wall, 2) if wall else 0.0,
+        "aggregate_chars_per_sec": round(sum(r["chars"] for r in ok) / wall, 2) if wall else 0.0,
+    }
+
+
+def print_report(report: dict) -> None:
+    print("=" * 60)
+    print("Load Test Results")
+    print("=" * 60)
+    cfg = report["config"]
+    print(f"URL: {cfg['url']}  concurrency: {cfg['concurrency']}  requests: {cfg['requests']}")
+    print(f"Wall time: {report['wall_seconds']}s ({report['requests_per_sec']} req/s)")
+    print(f"Success: {report['success']}  error rate: {report['error_rate']:.2%}")
+    for error, count in report["errors"].items():
+        print(f"  - {count}x {error}")
+
+    for key, label in (
+        ("ttft_seconds", "TTFT (s)"),
+        ("latency_seconds", "Latency (s)"),
+        ("tokens_per_sec_per_stream", "Tokens/s per stream"),
+    ):
+        s = report[key]
+        print(f"{label:<22} p50 {s['p50']:<9} p95 {s['p95']:<9} p99 {s['p99']:<9} max {s['max']}")
+
+    for stage, s in report["server_stage_seconds"].items():
+        print(f"  {stage:<20} p50 {s['p50']:<9} p95 {s['p95']:<9} p99 {s['p99']:<9} max {s['max']}")
+
+    print(f"Aggregate: {report['aggregate_events_per_sec']} events/s, {report['aggregate_chars_per_sec']} chars/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the /chat SSE endpoint")
+    parser.add_argument("--url", default="http://localhost:8000/chat")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--question", default=DEFAULT_QUESTION)
+    parser.add_argument("--questions-file", help="One question per line, used round-robin")
+    parser.add_argument("--vary", action="store_true", help="Make every question unique (bypasses caches)")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--json", help="Also write the report to this file")
+
+    args = parser.parse_args()
+    report = asyncio.run(run_load(args))
+    print_report(report)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\nReport written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
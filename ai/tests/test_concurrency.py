@@ -0,0 +1,97 @@
+"""
+Concurrent retrievals must overlap, not run one after another.
+
+A fake vector store stands in for ChromaDB and Ollama: its query
+embedding awaits (like the async HTTP call) and its index lookup blocks
+(like `collection.query`, which runs on the bounded executor).
+"""
+
+import asyncio
+import threading
+import time
+
+from app.config import settings
+from app.rag.retriever import Retriever
+from app.rag.vectorstore import BaseVectorStore
+
+EMBED_SECONDS = 0.2
+QUERY_SECONDS = 0.2
+
+
+class SlowEmbeddingFunction:
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def embed_query_async(self, input):
+        queries = input if isinstance(input, list) else [input]
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(EMBED_SECONDS)
+        finally:
+            self.in_flight -= 1
+        return [[1.0, 0.0] for _ in queries]
+
+
+class SlowVectorStore(BaseVectorStore):
+    collection_name = "test"
+    persist_dir = "."
+
+    def __init__(self):
+        self.embedding_function = SlowEmbeddingFunction()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def query_embeddings(self, embeddings, top_k=None):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(QUERY_SECONDS)  # Blocking, like a ChromaDB query
+        with self._lock:
+            self.in_flight -= 1
+        return [
+            [{"id": "doc", "content": "text", "metadata": {"source": "test"}, "distance": 0.0, "score": 1.0}]
+            for _ in embeddings
+        ]
+
+
+async def _run(concurrency: int):
+    store = SlowVectorStore()
+    retriever = Retriever(vectorstore=store, hybrid=False, reranker=None, similarity_threshold=0.0)
+
+    # Largest gap between ticks of a 10 ms timer: large if the loop was blocked
+    longest_gap = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal longest_gap
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0.01)
+            now = time.perf_counter()
+            longest_gap = max(longest_gap, now - last)
+            last = now
+
+    tick = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    results = await asyncio.gather(*(retriever.retrieve(f"question {i}") for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    done = True
+    await tick
+    return store, results, elapsed, longest_gap
+
+
+def test_concurrent_retrievals_overlap():
+    concurrency = settings.vectorstore_max_workers
+    store, results, elapsed, longest_gap = asyncio.run(_run(concurrency))
+
+    assert all(r and r[0]["id"] == "doc" for r in results)
+    # Every embedding was awaited at once, and the index lookups shared the executor
+    assert store.embedding_function.max_in_flight == concurrency
+    assert store.max_in_flight == concurrency
+    # Serial execution would take concurrency * (EMBED_SECONDS + QUERY_SECONDS)
+    assert elapsed < 2 * (EMBED_SECONDS + QUERY_SECONDS)
+    # The blocking lookups ran off the event loop
+    assert longest_gap < QUERY_SECONDS / 2
@@ -0,0 +1,70 @@
+"""
+Reranking against the shared SQLite cache.
+
+SQLite cache writes are applied by a background writer thread. These
+tests hold that thread busy, so nothing queued is committed, and check
+that a caller still reads its own writes.
+"""
+
+import asyncio
+import threading
+from contextlib import contextmanager
+
+from app.cachestore import SQLiteCache, _get_writer
+from app.rag.reranker import Reranker, ScoreCache
+
+
+class FakeReranker(Reranker):
+    model = "fake"
+
+    async def _score_batch(self, query, texts):
+        return [float(text.split()[-1]) for text in texts]
+
+
+@contextmanager
+def writer_blocked():
+    """Keep the cache writer thread busy until the block exits."""
+    release = threading.Event()
+    _get_writer().submit(release.wait)
+    try:
+        yield
+    finally:
+        release.set()
+
+
+def test_rerank_orders_by_fresh_scores(tmp_path):
+    backend = SQLiteCache("rerank", path=str(tmp_path / "cache.sqlite3"))
+    reranker = FakeReranker(batch_size=2, budget_ms=5000, cache=ScoreCache(backend=backend))
+    results = [{"id": f"i{i}", "content": f"passage {score}"} for i, score in enumerate([1, 3, 2, 0, 5], 1)]
+
+    with writer_blocked():
+        ranked = asyncio.run(reranker.rerank("question", results, top_k=2))
+        assert [(r["id"], r["rerank_score"]) for r in ranked] == [("i5", 5.0), ("i2", 3.0)]
+
+        # Scores are served from the queued writes before they are committed
+        assert reranker.cache.get("fake", "question", "i3") == 2.0
+
+    backend.flush()
+    assert len(backend) == 5
+
+
+def test_sqlite_cache_reads_its_own_writes(tmp_path):
+    backend = SQLiteCache("test", path=str(tmp_path / "cache.sqlite3"))
+    backend.set(b"kept", b"1")
+    backend.flush()
+
+    with writer_blocked():
+        backend.set(b"new", b"2")
+        backend.delete(b"kept")
+        assert backend.get(b"new") == b"2"
+        assert backend.get(b"kept") is None
+
+        backend.clear()
+        backend.set(b"after", b"3")
+        assert backend.get(b"new") is None
+        assert backend.get(b"after") == b"3"
+
+    backend.flush()
+    assert backend.get(b"after") == b"3"
+    assert backend.get(b"new") is None
+    assert len(backend) == 1